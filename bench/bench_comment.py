@@ -0,0 +1,71 @@
+# コメント 1 件あたりのコスト：旧方式（ネスト dict + フォールバックループ + ensure_aa の正規表現）
+# vs CommentEngine の平坦化テーブル
+#   python bench/bench_comment.py [-n 200000]
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import main
+
+def legacy_get(engine, dialect, weather, temp, timeband, has_thunder):
+    # 旧 CommentEngine.get/_pick_base/_pick_tail をそのまま移植（比較用）
+    d = dialect if dialect in engine.dialects else "kanto"
+    text = None
+    for dd in [d, "kanto"]:
+        block = engine.pack(dd)["base"].get(weather, {}).get(temp, [])
+        if block:
+            text = random.choice(block)
+            break
+    if text is None:
+        text = engine._resolve_base(d, weather, temp)[0]
+    tail = None
+    for dd in [d, "kanto"]:
+        block = engine.pack(dd)["tails"].get(timeband, [])
+        if block:
+            tail = random.choice(block)
+            break
+    if tail is None:
+        tail = engine._resolve_tail(d, timeband)[0]
+    s = f"{text} {tail}".strip()
+    if has_thunder:
+        s += " " + random.choice(engine.pack(d)["thunder"])
+    return main.ensure_aa(s)
+
+def cases(engine, n: int):
+    rnd = random.Random(1)
+    return [
+        (rnd.choice(engine.dialects), rnd.choice(main.WEATHER_KEYS), rnd.choice(main.TEMP_KEYS),
+         rnd.choice(main.TIMEBANDS), rnd.random() < 0.1)
+        for _ in range(n)
+    ]
+
+def run(fn, items):
+    for args in items:
+        fn(*args)
+
+def main_(n: int):
+    engine = main.engine
+    items = cases(engine, 1000)
+    # 同じ乱数列なら同じ文になること（挙動が変わっていないこと）を先に確認
+    for seed, args in enumerate(items):
+        random.seed(seed); a = legacy_get(engine, *args)
+        random.seed(seed); b = engine.get(*args)
+        assert a == b, (args, a, b)
+        # 種付きの乱数なら、グローバルの乱数がどう進んでいても同じ文になること
+        c = engine.get(*args, random.Random(seed))
+        random.seed(seed + 1)
+        assert c == engine.get(*args, random.Random(seed)), (args, c)
+    loops = max(1, n // len(items))
+    old = timeit.timeit(lambda: run(lambda *a: legacy_get(engine, *a), items), number=loops) / (loops * len(items))
+    new = timeit.timeit(lambda: run(engine.get, items), number=loops) / (loops * len(items))
+    print(f"legacy {old*1e6:.2f} us/comment   table {new*1e6:.2f} us/comment   x{old/new:.1f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200000)
+    main_(ap.parse_args().n)
@@ -0,0 +1,63 @@
+# Open-Meteo 応答のデコード：旧 resp.json()（bytes→str→json.loads）vs make_json_decoder の各候補
+# msgspec があれば、使う列だけ持つ型付き Struct へのデコードも参考として測る
+#   python bench/bench_decode.py [-n 200]
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import main
+from payloads import FIXTURE_HOURS, load_fixture_bytes
+
+def legacy_decode(body: bytes):
+    # aiohttp の resp.json() と同じ：一度 str にしてから標準 json
+    return json.loads(body.decode("utf-8"))
+
+def decoders() -> dict:
+    out = {"resp.json()": legacy_decode}
+    for name in ("json", "orjson", "msgspec"):
+        got, fn, _ = main.make_json_decoder(name)
+        if got == name:
+            out[name] = fn
+    try:
+        import msgspec
+    except ImportError:
+        return out
+
+    class Hourly(msgspec.Struct):
+        time: list[str]
+        temperature_2m: list[float | None] = []
+        precipitation_probability: list[int | None] = []
+        precipitation: list[float | None] = []
+        weathercode: list[int | None] = []
+        windspeed_10m: list[float | None] = []
+
+    class Forecast(msgspec.Struct):
+        hourly: Hourly
+        utc_offset_seconds: int | None = None
+
+    out["msgspec Struct"] = msgspec.json.Decoder(Forecast).decode
+    return out
+
+def main_(n: int):
+    print(f"decoder in use: {main.JSON_DECODER}")
+    for hours in FIXTURE_HOURS:
+        body = load_fixture_bytes(hours)
+        want = legacy_decode(body)
+        cells = []
+        for name, fn in decoders().items():
+            if name != "msgspec Struct":
+                assert fn(body) == want, name  # 同じ dict になること
+            t = timeit.timeit(lambda: fn(body), number=n) / n
+            cells.append(f"{name} {t*1e6:8.1f}us")
+        print(f"{hours:4d}h {len(body)/1024:6.1f}KiB  " + "  ".join(cells))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    main_(ap.parse_args().n)
@@ -0,0 +1,72 @@
+# on_message の入口：合成メッセージ列を流して、1 コアで 1 秒に何通さばけるか
+# 旧方式（毎通 MENTION_PATTERN.search + sub）vs message_query（mentions で先に弾く）
+#   python bench/bench_on_message.py [-n 200000] [--hit 0.01]
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import main
+
+BOT = SimpleNamespace(id=1111111111111111111, bot=True)
+OTHER = SimpleNamespace(id=2222222222222222222, bot=False)
+CHATTER = ["おはよう", "今日の STEPN どうだった？", "GST 上がってる", "w", "ランチ行く人ー",
+           "https://example.com/some/long/link?with=query", "それな", "明日は雨らしいよ " * 4]
+
+def legacy_query(message, bot_user):
+    # 旧 on_message の入口（比較用にそのまま移植）
+    if message.author.bot:
+        return None
+    content = message.content
+    m = main.MENTION_PATTERN.search(content)
+    if not m: return None
+    if int(m.group(1)) != bot_user.id: return None
+    rest = main.MENTION_PATTERN.sub("", content, count=1).strip()
+    return rest or None
+
+def stream(n: int, hit: float) -> list:
+    # 大半は無関係な雑談、少しだけ他人宛てメンション・Bot の発言、hit の割合で Bot 宛て
+    rnd = random.Random(1)
+    user, bot_author = SimpleNamespace(bot=False), SimpleNamespace(bot=True)
+    out = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < hit:
+            msg = (f"<@{BOT.id}> {rnd.choice(['大阪', '東京 12h', '札幌'])}", [BOT], user)
+        elif r < hit + 0.05:
+            msg = (f"<@!{OTHER.id}> {rnd.choice(CHATTER)}", [OTHER], user)
+        elif r < hit + 0.07:
+            msg = (rnd.choice(CHATTER), [], bot_author)
+        else:
+            msg = (rnd.choice(CHATTER), [], user)
+        content, mentions, author = msg
+        out.append(SimpleNamespace(content=content, mentions=mentions, author=author, guild=None))
+    return out
+
+def rate(fn, messages) -> float:
+    t0 = time.perf_counter()
+    for m in messages:
+        fn(m, BOT)
+    return len(messages) / (time.perf_counter() - t0)
+
+def main_(n: int, hit: float):
+    messages = stream(n, hit)
+    # 同じ入力なら同じ地名を取り出すこと
+    for m in messages[:5000]:
+        assert legacy_query(m, BOT) == main.message_query(m, BOT), m.content
+    old = rate(legacy_query, messages)
+    new = rate(main.message_query, messages)
+    print(f"{n} messages, {hit:.1%} addressed to the bot")
+    print(f"legacy {old/1e6:.2f}M msg/s/core   prefilter {new/1e6:.2f}M msg/s/core   x{new/old:.1f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200000)
+    ap.add_argument("--hit", type=float, default=0.01)
+    a = ap.parse_args()
+    main_(a.n, a.hit)
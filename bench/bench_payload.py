@@ -0,0 +1,27 @@
+# 窓付き取得（forecast_hours）と全期間取得のサイズ/JSONデコード時間の比較
+#   python bench/bench_payload.py [-n 5000]
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from payloads import FIXTURE_HOURS, load_fixture_bytes
+
+def main(n: int):
+    base = None
+    for hours in sorted(FIXTURE_HOURS):
+        raw = load_fixture_bytes(hours)
+        text = raw.decode("utf-8")
+        sec = timeit.timeit(lambda: json.loads(text), number=n) / n
+        base = base or (len(raw), sec)
+        print(f"{hours:4d}h  {len(raw):7d} B  decode {sec*1e6:8.2f} us  "
+              f"(x{len(raw)/base[0]:.1f} size, x{sec/base[1]:.1f} time vs window)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5000)
+    main(ap.parse_args().n)
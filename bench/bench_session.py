@@ -0,0 +1,67 @@
+# 使い捨てセッション vs 共有セッションのレイテンシ比較
+#   python bench/bench_session.py [-n 200] [--latency 0.005]
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import aiohttp
+
+import main
+from stub_openmeteo import StubOpenMeteo
+
+QUERY = "ベンチ地点"  # data/places.json に無い名前（オフライン辞書で即答させない）
+
+async def one_lookup(session: aiohttp.ClientSession):
+    # 毎回キャッシュを空にして、ジオコーディングと予報の 2 本を必ずスタブまで届かせる
+    main.geocode_cache._data.clear()
+    main.forecast_cache._data.clear()
+    geo = await main.geocode(session, QUERY)
+    await main.fetch_forecast(session, geo["latitude"], geo["longitude"], geo["timezone"])
+
+async def run_fresh(n: int) -> list[float]:
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            await one_lookup(session)
+        lat.append(time.perf_counter() - t0)
+    return lat
+
+async def run_shared(n: int) -> list[float]:
+    lat = []
+    async with main.make_http_session() as session:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            await one_lookup(session)
+            lat.append(time.perf_counter() - t0)
+    return lat
+
+def report(label: str, lat: list[float]):
+    lat = sorted(lat)
+    p95 = lat[int(len(lat) * 0.95) - 1]
+    print(f"{label:7s} n={len(lat)}  mean={statistics.mean(lat)*1e3:.2f}ms  "
+          f"p50={statistics.median(lat)*1e3:.2f}ms  p95={p95*1e3:.2f}ms")
+
+async def amain(args):
+    stub = StubOpenMeteo(latency=args.latency)
+    await stub.start()
+    stub.point(main)
+    try:
+        report("fresh", await run_fresh(args.n))
+        report("shared", await run_shared(args.n))
+        print(f"upstream calls: {stub.calls}")
+    finally:
+        await stub.stop()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.0)
+    asyncio.run(amain(ap.parse_args()))
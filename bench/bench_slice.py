@@ -0,0 +1,70 @@
+# 直近N時間の切り出し：旧ループ vs slice_hourly（24h/168h/384h のフィクスチャ）
+#   TZ=Asia/Tokyo python bench/bench_slice.py [-n 2000] [--rows 3]
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import main
+from payloads import FIXTURE_START, load_fixture
+
+def legacy_rows(data: dict, now: datetime, n: int) -> list[dict]:
+    # 旧 get_next_3_hours のループ（比較用にそのまま移植）
+    times = data["hourly"]["time"]
+    temps = data["hourly"]["temperature_2m"]
+    pops  = data["hourly"].get("precipitation_probability", [0]*len(times))
+    precs = data["hourly"].get("precipitation", [0.0]*len(times))
+    codes = data["hourly"].get("weathercode", [0]*len(times))
+    winds = data["hourly"].get("windspeed_10m", [0.0]*len(times))
+    rows = []
+    for i, ts in enumerate(times):
+        try:
+            t = datetime.fromisoformat(ts.replace("Z", "+00:00")).astimezone(main.JST)
+        except Exception:
+            continue
+        if t >= now and len(rows) < n:
+            rows.append({
+                "time": t,
+                "temp": float(temps[i]),
+                "pop": int(pops[i]) if i < len(pops) and pops[i] is not None else 0,
+                "precip": float(precs[i]) if i < len(precs) and precs[i] is not None else 0.0,
+                "weathercode": int(codes[i]) if i < len(codes) and codes[i] is not None else 0,
+                "wind": float(winds[i]) if i < len(winds) and winds[i] is not None else 0.0,
+            })
+        if len(rows) == n:
+            break
+    return rows
+
+def host_is_jst() -> bool:
+    # 旧ループはオフセット無しの時刻を astimezone でホストのローカル時刻とみなす。
+    # ホストが JST のときだけ、旧ループの時刻が正しい（slice_hourly と突き合わせられる）
+    naive = FIXTURE_START.replace(tzinfo=None)
+    return naive.astimezone().utcoffset() == main.JST.utcoffset(naive)
+
+def bench(number: int, n_rows: int):
+    check = host_is_jst()
+    if not check:
+        print("host TZ is not JST: legacy times are shifted, skipping the row check "
+              "(run with TZ=Asia/Tokyo for comparable numbers)")
+    for hours in (24, 168, 384):
+        data = load_fixture(hours)
+        # 系列の後ろ寄り（全体の 3/4 地点）を「今」にして、線形走査のコストを見せる
+        now = FIXTURE_START + timedelta(hours=hours * 3 // 4, minutes=20)
+        if check:
+            assert [r["time"] for r in legacy_rows(data, now, n_rows)] == \
+                   [r["time"] for r in main.slice_hourly(data, now, n_rows)]
+        old = timeit.timeit(lambda: legacy_rows(data, now, n_rows), number=number) / number
+        new = timeit.timeit(lambda: main.slice_hourly(data, now, n_rows), number=number) / number
+        print(f"{hours:4d}h  legacy {old*1e6:9.2f} us   slice_hourly {new*1e6:7.2f} us   x{old/new:.1f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--rows", type=int, default=3)
+    args = ap.parse_args()
+    bench(args.n, args.rows)
@@ -0,0 +1,201 @@
+# オフライン負荷試験：Discord も Open-Meteo も使わず、パイプライン全体のスループットを測る
+#   python bench/loadtest.py [-n 2000] [-c 50] [--places 40] [--latency 0.02] [--jitter 0.01]
+#                            [--error-rate 0.01] [--fixture 168] [--hours 3] [--mode all] [--unlimited]
+#
+# core        : get_next_3_hours（--hours 指定時は get_next_hours）→ build_embed → build_comment
+# message     : 偽の Message で on_message（メンション → 返信まで）
+# interaction : 偽の Interaction で /weather
+# multi       : 偽の Message で「@Bot 札幌 東京 福岡」（空白区切りの複数地点 → split_places → get_batch_hours）
+# Open-Meteo はローカルスタブ（遅延・エラー率・固定フィクスチャを指定できる）。
+# フィクスチャは make_forecast で合成したもので、実際の Open-Meteo 応答を記録したものではない
+# 各モードの前にキャッシュを空にするので、上流呼び出し数はモードごとのコールドスタートからの値
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import main
+from stub_openmeteo import StubOpenMeteo
+
+BOT_USER = SimpleNamespace(id=1111111111111111111, bot=True, mention="<@1111111111111111111>")
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+    @asynccontextmanager
+    async def typing(self):
+        yield
+
+class FakeMessage:
+    def __init__(self, content: str, user_id: int, channel: FakeChannel, sink: list):
+        self.content = content
+        self.author = SimpleNamespace(id=user_id, bot=False)
+        self.mentions = [BOT_USER]
+        self.channel = channel
+        self.guild = None
+        self._sink = sink
+
+    async def reply(self, content=None, embed=None, **kwargs):
+        self._sink.append((content, embed))
+
+class FakeInteraction:
+    def __init__(self, user_id: int, channel_id: int, sink: list):
+        self.user = SimpleNamespace(id=user_id)
+        self.channel_id = channel_id
+        self.guild_id = None
+        self._sink = sink
+        self.response = SimpleNamespace(defer=self._defer, send_message=self._send)
+        self.followup = SimpleNamespace(send=self._send)
+
+    async def _defer(self, **kwargs):
+        pass
+
+    async def _send(self, content=None, embed=None, **kwargs):
+        self._sink.append((content, embed))
+
+def reset_state():
+    # 毎モード同じ条件（コールドキャッシュ）から始める
+    for cache in (main.geocode_cache, main.forecast_cache, main.render_cache):
+        cache._data.clear()
+        cache.weight = cache.hits = cache.misses = cache.evictions = 0
+    main.forecast_versions._data.clear()
+    main.upstream.breakers.clear()
+    main.metrics.stages.clear()
+    main.metrics.counters.clear()
+
+def lift_limits():
+    # 毎分/毎日の上限を外す（同時実行数はそのまま）。パイプライン自体の速さだけを見たいとき用
+    main.upstream.governors = {
+        name: main.Governor(name, 10**9, 10**9, cfg[2], 10**6, 60.0)
+        for name, cfg in main.RATE_LIMITS.items()
+    }
+
+# 地名辞書にある、互いに離れた都市（空白区切りでも上流に聞かずに分けられる）
+MULTI_CITIES = ["札幌", "仙台", "東京", "名古屋", "大阪", "広島", "福岡", "那覇"]
+
+def multi_queries(n: int) -> list[str]:
+    rnd = random.Random(1)
+    return [" ".join(rnd.sample(MULTI_CITIES, 3)) for _ in range(n)]
+
+def queries(n: int, places: int) -> list[str]:
+    # 地名辞書に当たらない名前にして、ジオコーディングもスタブまで届かせる。人気は偏らせる（Zipf 風）
+    rnd = random.Random(1)
+    weights = [1 / (i + 1) for i in range(places)]
+    return [f"負荷試験{i:03d}" for i in rnd.choices(range(places), weights, k=n)]
+
+async def run_core(session, q: str, hours: int | None) -> bool:
+    if hours is None:
+        place, rows, err = await main.get_next_3_hours(session, q)
+    else:
+        place, rows, err = await main.get_next_hours(session, q, hours)
+    if err:
+        return False
+    main.build_embed(place, rows)
+    main.build_comment(rows, place)
+    return True
+
+async def run_message(q: str, hours: int | None, i: int, sink: list) -> bool:
+    text = f"{BOT_USER.mention} {q}" + (f" {hours}h" if hours else "")
+    msg = FakeMessage(text, user_id=10_000 + i, channel=FakeChannel(20_000 + i % 97), sink=sink)
+    await main.on_message(msg)
+    return bool(sink) and sink[-1][1] is not None
+
+async def run_multi(q: str, hours: int | None, i: int, sink: list) -> bool:
+    # 1 地点に潰れずに、地点ごとのフィールドがエラーなしで揃ったか
+    await run_message(q, hours, i, sink)
+    embed = sink[-1][1] if sink else None
+    return (embed is not None and len(embed.fields) == len(q.split())
+            and not any(f.value.startswith("⚠️") for f in embed.fields))
+
+async def run_interaction(q: str, hours: int | None, i: int, sink: list) -> bool:
+    inter = FakeInteraction(user_id=10_000 + i, channel_id=20_000 + i % 97, sink=sink)
+    await main.weather.callback(inter, q, hours or main.DEFAULT_HOURS)
+    return bool(sink) and sink[-1][1] is not None
+
+async def drive(mode: str, items: list[str], concurrency: int, hours: int | None, session) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    lat, ok = [], 0
+
+    async def one(i: int, q: str):
+        nonlocal ok
+        sink: list = []
+        async with sem:
+            t0 = time.perf_counter()
+            if mode == "core":
+                good = await run_core(session, q, hours)
+            elif mode == "message":
+                good = await run_message(q, hours, i, sink)
+            elif mode == "multi":
+                good = await run_multi(q, hours, i, sink)
+            else:
+                good = await run_interaction(q, hours, i, sink)
+            lat.append(time.perf_counter() - t0)
+            ok += good
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i, q) for i, q in enumerate(items)))
+    return {"elapsed": time.perf_counter() - t0, "lat": sorted(lat), "ok": ok}
+
+def pct(sorted_lat: list[float], q: float) -> float:
+    return sorted_lat[min(len(sorted_lat) - 1, int(q * len(sorted_lat)))]
+
+def report(mode: str, res: dict, stub: StubOpenMeteo):
+    lat, n = res["lat"], len(res["lat"])
+    print(f"{mode:11s} n={n} ok={res['ok']} {n / res['elapsed']:8.0f} req/s  "
+          f"p50={pct(lat, 0.5)*1e3:.2f}ms p95={pct(lat, 0.95)*1e3:.2f}ms p99={pct(lat, 0.99)*1e3:.2f}ms  "
+          f"upstream search={stub.calls['search']} forecast={stub.calls['forecast']} "
+          f"(5xx {stub.errors['search']}/{stub.errors['forecast']})")
+    for stage, hist in sorted(main.metrics.stages.items()):
+        p = hist.percentiles()
+        print(f"  {stage:10s} n={hist.count:6d} p50={p[0.5]*1e3:7.2f}ms p95={p[0.95]*1e3:7.2f}ms")
+    if main.metrics.counters:
+        print("  " + "  ".join(f"{k}={v}" for k, v in sorted(main.metrics.counters.items())))
+
+async def amain(args):
+    stub = StubOpenMeteo(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         fixture=args.fixture, vary_places=True)
+    await stub.start()
+    stub.point(main)
+    if args.unlimited:
+        lift_limits()
+    # on_message / /weather は client.user と client.session を見る。連投制限は負荷試験では外す
+    main.client._connection.user = BOT_USER
+    main.USER_LIMIT = main.CHANNEL_LIMIT = 10**9
+    modes = ["core", "message", "interaction", "multi"] if args.mode == "all" else [args.mode]
+    items = queries(args.n, args.places)
+    multi_items = multi_queries(args.n)
+    try:
+        async with main.make_http_session() as session:
+            main.client.session = session
+            for mode in modes:
+                reset_state()
+                stub.calls = {"search": 0, "forecast": 0}
+                stub.errors = {"search": 0, "forecast": 0}
+                report(mode, await drive(mode, multi_items if mode == "multi" else items,
+                                         args.c, args.hours, session), stub)
+    finally:
+        main.client.session = None
+        await stub.stop()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000, help="リクエスト数（モードごと）")
+    ap.add_argument("-c", type=int, default=50, help="同時実行数")
+    ap.add_argument("--places", type=int, default=40, help="地点の種類数")
+    ap.add_argument("--hours", type=int, default=None, help="時間幅（省略で get_next_3_hours）")
+    ap.add_argument("--latency", type=float, default=0.02, help="スタブの応答遅延（秒）")
+    ap.add_argument("--jitter", type=float, default=0.0, help="遅延のゆらぎ（±秒）")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="スタブが 502 を返す確率")
+    ap.add_argument("--fixture", type=int, default=None, help="bench/fixtures/forecast_<N>h.json を返す")
+    ap.add_argument("--mode", choices=["core", "message", "interaction", "multi", "all"], default="all")
+    ap.add_argument("--unlimited", action="store_true", help="上流の毎分/毎日の上限を外す")
+    asyncio.run(amain(ap.parse_args()))
@@ -0,0 +1,21 @@
+# bench/fixtures/ の forecast_*h.json を作り直す（Open-Meteo 形式の合成データ、開始時刻固定）
+#   python bench/make_fixtures.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from payloads import FIXTURE_DIR, FIXTURE_HOURS, FIXTURE_START, fixture_path, make_forecast
+
+def main():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for hours in FIXTURE_HOURS:
+        path = fixture_path(hours)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_forecast(hours, FIXTURE_START), f, ensure_ascii=False, separators=(",", ":"))
+        print(path)
+
+if __name__ == "__main__":
+    main()
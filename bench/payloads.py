@@ -0,0 +1,57 @@
+# ベンチ用の Open-Meteo 形式ペイロード（合成 + bench/fixtures/ の固定ファイル）
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+JST = timezone(timedelta(hours=9))
+
+PLACE = {
+    "name": "大阪市", "latitude": 34.6937, "longitude": 135.5023,
+    "country": "日本", "admin1": "大阪府", "timezone": "Asia/Tokyo", "population": 2753862,
+}
+
+def make_forecast(hours: int = 168, start: datetime | None = None) -> dict:
+    """Open-Meteo 形式の hourly ペイロードを合成する（start から hours 本）"""
+    start = (start or datetime.now(JST)).replace(minute=0, second=0, microsecond=0)
+    times = [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(hours)]
+    return {
+        "latitude": PLACE["latitude"], "longitude": PLACE["longitude"],
+        "generationtime_ms": 0.5, "utc_offset_seconds": 9 * 3600,
+        "timezone": "Asia/Tokyo", "timezone_abbreviation": "JST", "elevation": 12.0,
+        "hourly_units": {
+            "time": "iso8601", "temperature_2m": "°C", "precipitation_probability": "%",
+            "precipitation": "mm", "weathercode": "wmo code", "windspeed_10m": "km/h",
+        },
+        "hourly": {
+            "time": times,
+            "temperature_2m": [20.0 + (i % 10) * 0.5 for i in range(hours)],
+            "precipitation_probability": [(i * 7) % 100 for i in range(hours)],
+            "precipitation": [round((i % 5) * 0.2, 1) for i in range(hours)],
+            "weathercode": [(0, 2, 3, 61, 80)[i % 5] for i in range(hours)],
+            "windspeed_10m": [2.0 + (i % 4) for i in range(hours)],
+        },
+    }
+
+def rebase_forecast(data: dict, hours: int | None = None, start: datetime | None = None) -> dict:
+    """固定ペイロード（make_fixtures.py で合成したもの）の時刻を start（既定は今の正時）からに付け替え、先頭 hours 本に切る"""
+    start = (start or datetime.now(JST)).replace(minute=0, second=0, microsecond=0)
+    src = data["hourly"]
+    n = len(src["time"]) if hours is None else min(hours, len(src["time"]))
+    hourly = {k: v[:n] for k, v in src.items()}
+    hourly["time"] = [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(n)]
+    return {**data, "hourly": hourly}
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURE_START = datetime(2025, 8, 10, 0, 0, tzinfo=JST)
+FIXTURE_HOURS = (6, 24, 168, 384)
+
+def fixture_path(hours: int) -> str:
+    return os.path.join(FIXTURE_DIR, f"forecast_{hours}h.json")
+
+def load_fixture_bytes(hours: int) -> bytes:
+    with open(fixture_path(hours), "rb") as f:
+        return f.read()
+
+def load_fixture(hours: int) -> dict:
+    return json.loads(load_fixture_bytes(hours))
@@ -0,0 +1,92 @@
+# Open-Meteo のローカルスタブ（ベンチ/負荷試験用）
+# /v1/search と /v1/forecast を aiohttp.web で返すだけ。本番 API には一切触らない。
+
+import asyncio
+import random
+import zlib
+
+from aiohttp import web
+
+from payloads import PLACE, load_fixture, make_forecast, rebase_forecast
+
+class StubOpenMeteo:
+    """latency 秒（±jitter）の遅延と error_rate の確率で 502 を返すスタブ
+
+    fixture に時間数（bench/fixtures/forecast_<N>h.json）を渡すと、毎回合成する代わりに
+    make_fixtures.py で作った固定ペイロード（これも合成。実応答の記録ではない）を時刻だけ今に
+    付け替えて返す。vary_places なら検索した名前ごとに座標をずらす
+    （予報キャッシュが地点ごとに別の格子になる）。
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, hours: int = 168,
+                 jitter: float = 0.0, fixture: int | None = None, vary_places: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hours = hours
+        self.fixture = load_fixture(fixture) if fixture else None
+        self.vary_places = vary_places
+        self.calls = {"search": 0, "forecast": 0}
+        self.errors = {"search": 0, "forecast": 0}
+        self._runner: web.AppRunner | None = None
+        self.base = ""
+
+    async def _delay_or_fail(self):
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return random.random() < self.error_rate
+
+    def _place(self, name: str) -> dict:
+        if not self.vary_places:
+            return PLACE
+        # 名前から決まる位置にずらす（同じ名前なら毎回同じ座標）
+        h = zlib.crc32(name.encode("utf-8"))
+        return {**PLACE, "name": name,
+                "latitude": round(PLACE["latitude"] + (h % 400) * 0.05, 4),
+                "longitude": round(PLACE["longitude"] + (h // 400 % 400) * 0.05, 4)}
+
+    def _payload(self, hours: int) -> dict:
+        if self.fixture is not None:
+            return rebase_forecast(self.fixture, hours)
+        return make_forecast(hours)
+
+    async def _search(self, request: web.Request):
+        self.calls["search"] += 1
+        if await self._delay_or_fail():
+            self.errors["search"] += 1
+            return web.Response(status=502)
+        return web.json_response({"results": [self._place(request.query.get("name", ""))]})
+
+    async def _forecast(self, request: web.Request):
+        self.calls["forecast"] += 1
+        if await self._delay_or_fail():
+            self.errors["forecast"] += 1
+            return web.Response(status=502)
+        hours = int(request.query.get("forecast_hours", self.hours))
+        # 複数座標（カンマ区切り）なら地点順の list で返す（本物と同じ）
+        n = len(request.query.get("latitude", "").split(","))
+        if n > 1:
+            return web.json_response([self._payload(hours) for _ in range(n)])
+        return web.json_response(self._payload(hours))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_get("/v1/search", self._search)
+        app.router.add_get("/v1/forecast", self._forecast)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://{host}:{port}"
+        return self.base
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def point(self, module):
+        """main モジュールの URL 定数をスタブに向ける"""
+        module.GEOCODE_URL = f"{self.base}/v1/search"
+        module.FORECAST_URL = f"{self.base}/v1/forecast"
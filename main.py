@@ -5,8 +5,20 @@
 
 import os
 import re
+import json
+import time
+import asyncio
+import bisect
+import itertools
 import random
+import sqlite3
+import sys
+import unicodedata
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
 
 # .env（無くても動く）
 try:
@@ -15,8 +27,14 @@ try:
 except Exception:
     pass
 
+try:
+    import fcntl  # ファイルロック（Windows には無い）
+except ImportError:
+    fcntl = None
+
 import aiohttp
 import discord
+from aiohttp import web
 from discord import app_commands
 
 # ---- Config ----
@@ -24,22 +42,730 @@ BOT_VERSION = "2025-08-10-11"
 BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 JST = timezone(timedelta(hours=9))
 USER_AGENT = f"STEPN-Weather-Bot/{BOT_VERSION} (contact: your-email@example.com)"
+GEOCODE_URL = os.getenv("OPEN_METEO_GEOCODE_URL", "https://geocoding-api.open-meteo.com/v1/search")
+FORECAST_URL = os.getenv("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
 
 INTENTS = discord.Intents.default()
 INTENTS.message_content = True
 
-class WeatherBot(discord.Client):
+# ---- Sharding（ギルドが増えたら AutoShardedClient で複数接続・複数プロセスに分ける） ----
+def parse_shard_ids(spec: str) -> list[int] | None:
+    # "0-3,8" → [0, 1, 2, 3, 8]。空ならこのプロセスが全シャードを受け持つ
+    ids = set()
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lo, _, hi = part.partition("-")
+        ids.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(ids) or None
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))           # 全体のシャード数。0 なら Discord の推奨値
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", ""))  # このプロセスのシャード（例 "0-3"）
+SHARDED = os.getenv("SHARDED", "0") == "1" or SHARD_COUNT > 0 or SHARD_IDS is not None
+if SHARD_IDS is not None and not (SHARD_COUNT and max(SHARD_IDS) < SHARD_COUNT):
+    raise RuntimeError("SHARD_IDS を使うときは、それより大きい SHARD_COUNT も設定してください。")
+
+def shard_for(guild_id: int | None) -> int:
+    # Discord の割り当て規則。DM はシャード 0 に届く
+    return (guild_id >> 22) % SHARD_COUNT if (guild_id and SHARD_COUNT) else 0
+
+def owns_guild(guild_id: int | None) -> bool:
+    return SHARD_IDS is None or shard_for(guild_id) in SHARD_IDS
+
+# ---- HTTP（Bot 全体で 1 セッションを使い回す） ----
+HTTP_LIMIT = int(os.getenv("HTTP_LIMIT", "100"))                  # 全体の同時接続上限
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "20")) # ホストごとの同時接続上限
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))         # keep-alive 秒
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "600"))              # DNS キャッシュ秒
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+def make_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_LIMIT,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        use_dns_cache=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+# ---- JSON デコーダ（上流の応答は bytes のまま渡す。orjson / msgspec があればそれを使う） ----
+def make_json_decoder(name: str = "auto"):
+    """(名前, bytes/str → Python オブジェクト, デコード失敗の例外) を返す。入っていなければ次の候補へ"""
+    if name not in ("auto", "orjson", "msgspec", "json"):
+        raise RuntimeError(f"JSON_DECODER={name} は使えません（auto/orjson/msgspec/json）")
+    for cand in (["orjson", "msgspec", "json"] if name == "auto" else [name, "json"]):
+        if cand == "orjson":
+            try:
+                import orjson
+            except ImportError:
+                continue
+            return "orjson", orjson.loads, (orjson.JSONDecodeError,)
+        if cand == "msgspec":
+            try:
+                import msgspec
+            except ImportError:
+                continue
+            return "msgspec", msgspec.json.Decoder().decode, (msgspec.DecodeError,)
+    return "json", json.loads, (ValueError,)
+
+JSON_DECODER, json_loads, JSON_ERRORS = make_json_decoder(os.getenv("JSON_DECODER", "auto"))
+
+class WeatherBot(discord.AutoShardedClient if SHARDED else discord.Client):
     def __init__(self):
-        super().__init__(intents=INTENTS)
+        shards = {"shard_count": SHARD_COUNT or None, "shard_ids": SHARD_IDS} if SHARDED else {}
+        super().__init__(intents=INTENTS, **shards)
         self.tree = app_commands.CommandTree(self)
+        self.session: aiohttp.ClientSession | None = None
+        self.metrics_runner: web.AppRunner | None = None
+        self.scheduler: SubscriptionScheduler | None = None
+        self.refresher: HotRefresher | None = None
 
     async def setup_hook(self):
+        # TCP/TLS ハンドシェイクを毎回払わないよう、セッションは Bot の寿命で持つ
+        self.session = make_http_session()
+        if geocode_store:
+            # 前回までに覚えた地名でキャッシュを温めておく（デプロイ直後の API 連打を防ぐ）
+            n = await geocode_store.open(geocode_cache)
+            print(f"geocode store: warmed {n} places from {geocode_store.path}")
+        if shared_forecasts:
+            await shared_forecasts.open()
+            print(f"shared forecast cache: {shared_forecasts.path}")
+        if METRICS_PORT:
+            self.metrics_runner = await start_metrics_server(METRICS_PORT)
+            print(f"metrics: http://0.0.0.0:{METRICS_PORT}/metrics")
+        await subscriptions.load()
+        self.scheduler = SubscriptionScheduler(self, subscriptions)
+        self.scheduler.start()
+        self.refresher = HotRefresher(self, hot_places)
+        self.refresher.start()
         await self.tree.sync()
 
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            if self.scheduler:
+                self.scheduler.stop()
+                self.scheduler = None
+            if self.refresher:
+                self.refresher.stop()
+                self.refresher = None
+            if self.session and not self.session.closed:
+                await self.session.close()
+            self.session = None
+            if geocode_store:
+                await geocode_store.close()
+            if shared_forecasts:
+                await shared_forecasts.close()
+            if self.metrics_runner:
+                await self.metrics_runner.cleanup()
+                self.metrics_runner = None
+
 client = WeatherBot()
 
+# ---------- Metrics ----------
+# 段ごとのレイテンシ（直近 N 件で p50/p95/p99）と各種カウンタ。/botstats と /metrics で見る
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 なら Prometheus 用エンドポイントは立てない
+
+class LatencyHistogram:
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, qs=(0.5, 0.95, 0.99)) -> dict:
+        if not self.samples:
+            return {q: 0.0 for q in qs}
+        data = sorted(self.samples)
+        last = len(data) - 1
+        return {q: data[min(last, int(q * len(data)))] for q in qs}
+
+class Metrics:
+    def __init__(self):
+        self.stages: dict[str, LatencyHistogram] = {}
+        self.counters: dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = LatencyHistogram()
+        hist.observe(seconds)
+
+    def incr(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage: str):
+        # async 関数の中でも with で使える（await を挟んだ経過時間をそのまま測る）
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.incr(f"error.{stage}")
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+metrics = Metrics()
+
+# ---------- Upstream ----------
+# 上流（Open-Meteo）呼び出しの共通口：リトライ（指数バックオフ+ジッタ）とホスト単位のサーキットブレーカー
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))                   # 初回に加えて何回まで
+UPSTREAM_ATTEMPT_TIMEOUT = float(os.getenv("UPSTREAM_ATTEMPT_TIMEOUT", "6"))  # 1 回あたりの秒数
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.3"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "3"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))   # 連続失敗でオープン
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # オープン中は即失敗にする秒数
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitBreaker:
+    """closed → (連続失敗) → open → (cooldown 後に 1 本だけ試す) half-open → closed/open"""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self):
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+# ---- 上流の流量制御：サービス別（geocode/forecast）にトークンバケット + 同時実行数 ----
+# Open-Meteo 無料枠の分/日あたり上限を 1 つのギルドで食い潰さないため。詰まったら待たせずに断る
+RATE_LIMITS = {
+    # service: (毎分, 毎日, 同時実行, 待ち行列の上限, 最大待ち秒)
+    "geocode": (int(os.getenv("GEOCODE_PER_MINUTE", "200")), int(os.getenv("GEOCODE_PER_DAY", "4000")),
+                int(os.getenv("GEOCODE_CONCURRENCY", "8")), int(os.getenv("GEOCODE_MAX_QUEUE", "64")),
+                float(os.getenv("GEOCODE_MAX_WAIT", "5"))),
+    "forecast": (int(os.getenv("FORECAST_PER_MINUTE", "300")), int(os.getenv("FORECAST_PER_DAY", "6000")),
+                 int(os.getenv("FORECAST_CONCURRENCY", "8")), int(os.getenv("FORECAST_MAX_QUEUE", "64")),
+                 float(os.getenv("FORECAST_MAX_WAIT", "5"))),
+}
+
+class UpstreamBusy(Exception):
+    """上流の予算/待ち行列がいっぱいで、今は投げられない"""
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / period  # 1 秒あたりの補充量
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class Governor:
+    def __init__(self, service: str, per_minute: int, per_day: int, concurrency: int,
+                 max_queue: int, max_wait: float):
+        self.service = service
+        self.buckets = [TokenBucket(per_minute, 60), TokenBucket(per_day, 86400)]
+        self.sem = asyncio.Semaphore(concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waiting = 0
+
+    async def _acquire(self):
+        await self.sem.acquire()
+        try:
+            while True:
+                delay = max(b.wait_time() for b in self.buckets)
+                if delay <= 0:
+                    for b in self.buckets:
+                        b.take()
+                    return
+                if delay > self.max_wait:
+                    raise UpstreamBusy(self.service)  # 日次枠切れなど、待っても無駄
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.sem.release()
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_queue:
+            metrics.incr(f"shed.{self.service}")
+            raise UpstreamBusy(self.service)
+        self.waiting += 1
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._acquire(), self.max_wait)
+        except (asyncio.TimeoutError, UpstreamBusy):
+            metrics.incr(f"shed.{self.service}")
+            raise UpstreamBusy(self.service) from None
+        finally:
+            self.waiting -= 1
+            metrics.observe(f"queue.{self.service}", time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            self.sem.release()
+
+class Upstream:
+    def __init__(self):
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.governors = {name: Governor(name, *cfg) for name, cfg in RATE_LIMITS.items()}
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        br = self.breakers.get(host)
+        if br is None:
+            br = self.breakers[host] = CircuitBreaker()
+        return br
+
+    def is_open(self, url: str) -> bool:
+        return self.breaker(url).state == "open"
+
+    async def get_json(self, session: aiohttp.ClientSession, service: str, url: str, params: dict):
+        """成功なら JSON、失敗（リトライ切れ/4xx/ブレーカー open）なら None。混雑時は UpstreamBusy"""
+        br = self.breaker(url)
+        for attempt in range(UPSTREAM_RETRIES + 1):
+            if not br.allow():
+                metrics.incr(f"upstream_short_circuit.{service}")
+                return None
+            if attempt:
+                metrics.incr(f"upstream_retry.{service}")
+            try:
+                async with self.governors[service].slot():
+                    async with session.get(url, params=params,
+                                           timeout=aiohttp.ClientTimeout(total=UPSTREAM_ATTEMPT_TIMEOUT)) as resp:
+                        if resp.status == 200:
+                            data = json_loads(await resp.read())
+                            br.success()
+                            return data
+                        metrics.incr(f"upstream_error.{service}")
+                        if resp.status not in RETRYABLE_STATUS:
+                            br.success()  # 4xx はこちらの問題なので上流の健康状態には数えない
+                            return None
+            except UpstreamBusy:
+                br.release_probe()  # 投げてすらいないので、健康状態には数えない
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, *JSON_ERRORS):
+                metrics.incr(f"upstream_error.{service}")
+            except BaseException:
+                # キャンセル（ヘッジで負けた試行など）。結果が出ていないので試験枠だけ返す
+                br.release_probe()
+                raise
+            br.failure()
+            if attempt < UPSTREAM_RETRIES:
+                # full jitter: 0〜min(max, base*2^n) の一様乱数だけ待つ
+                await asyncio.sleep(random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt)))
+        return None
+
+upstream = Upstream()
+
+# ---------- Cache ----------
+class TTLCache:
+    """LRU + TTL のインプロセスキャッシュ。None は「見つからない」として短い TTL で保存する"""
+
+    MISS = object()  # キャッシュ無し（None と区別するための番兵）
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float | None = None,
+                 max_weight: int | None = None, weigher=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        # max_weight/weigher を渡すと件数に加えて「重さ」（概算バイト数など）でも追い出す
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value, weight)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return TTLCache.MISS
+        expires_at, value, _ = item
+        if expires_at <= time.monotonic():
+            # 期限切れでも消さずに残す（上流障害時に peek_stale で古い値を返せるように）。
+            # 上限を超えたら LRU で普通に追い出される
+            self.misses += 1
+            return TTLCache.MISS
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek_stale(self, key):
+        """期限切れも含めて値を返す（統計・LRU 順は動かさない）"""
+        item = self._data.get(key)
+        return TTLCache.MISS if item is None else item[1]
+
+    def get_stale(self, key, max_stale: float):
+        """期限切れから max_stale 秒以内なら値を返す（stale-while-revalidate 用。統計は動かさない）"""
+        item = self._data.get(key)
+        if item is None or item[0] + max_stale <= time.monotonic():
+            return TTLCache.MISS
+        return item[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        if key in self._data:
+            self._drop(key)
+        weight = self.weigher(value) if (self.weigher and value is not None) else 0
+        self._data[key] = (time.monotonic() + ttl, value, weight)
+        self.weight += weight
+        while len(self._data) > self.maxsize or (
+            self.max_weight is not None and self.weight > self.max_weight and len(self._data) > 1
+        ):
+            old_key = next(iter(self._data))
+            self._drop(old_key)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, weight = self._data.pop(key)
+        self.weight -= weight
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "weight": self.weight, "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+class SingleFlight:
+    """同じキーの同時リクエストを 1 本の上流呼び出しにまとめる（結果も例外も共有）"""
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.leaders = 0    # 実際に上流へ出た数
+        self.coalesced = 0  # 相乗りで済んだ数
+
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.coalesced += 1
+        # 待ち手の 1 人がキャンセルされても、共有タスク自体は止めない
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 待ち手が全員いなくなっても警告を出さない
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
 # ---------- Geocoding ----------
+# 地名の座標はまず変わらないので長め、「見つからない」はタイプミス対策で短め
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "2048"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(7 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", "600"))
+geocode_cache = TTLCache(GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_TTL)
+geocode_flight = SingleFlight()
+# 候補（生クエリ/正式名/「市」付き）を重ねて投げるか（既定は順番に 1 本ずつ）。重ねる場合も、
+# 上位の候補が GEOCODE_HEDGE_DELAY 秒以内に当たれば下位は投げない（無料枠の呼び出し数を倍にしない）
+GEOCODE_PARALLEL = os.getenv("GEOCODE_PARALLEL", "0") == "1"
+GEOCODE_MAX_PARALLEL = int(os.getenv("GEOCODE_MAX_PARALLEL", "4"))
+GEOCODE_HEDGE_DELAY = float(os.getenv("GEOCODE_HEDGE_DELAY", "0.3"))
+
+def normalize_query(query: str) -> str:
+    # 全角/半角ゆれ・前後空白・連続空白・英字の大小をそろえる
+    q = unicodedata.normalize("NFKC", query).strip()
+    return " ".join(q.split()).casefold()
+
+class GeocodeStore:
+    """地名→座標を SQLite に残す書き込みスルーストア（起動時にキャッシュを温める）
+
+    書き込みは溜めてまとめて commit し、SQLite 操作はすべて専用スレッドで行う（イベントループを塞がない）。
+    """
+
+    FLUSH_INTERVAL = 5.0
+    FLUSH_BATCH = 100
+    GEO_FIELDS = ("name", "latitude", "longitude", "country", "admin1", "timezone")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocode-store")
+        self._conn: sqlite3.Connection | None = None
+        self._pending: dict = {}  # key -> (geo, via)
+        self._hits: dict = {}     # key -> 加算するヒット数
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open_sync(self, limit: int) -> list[tuple]:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " query TEXT PRIMARY KEY, name TEXT, latitude REAL, longitude REAL,"
+            " country TEXT, admin1 TEXT, timezone TEXT, resolved_via TEXT,"
+            " hits INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        cols = ", ".join(self.GEO_FIELDS)
+        # キャッシュに入りきる分だけ、よく聞かれる順に読む
+        return self._conn.execute(
+            f"SELECT query, {cols} FROM geocode ORDER BY hits DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    async def open(self, cache: TTLCache) -> int:
+        rows = await self._run(self._open_sync, cache.maxsize)
+        for query, *vals in reversed(rows):  # 一番よく聞かれる地名を最後に入れる（LRU で最後まで残る）
+            cache.set(query, dict(zip(self.GEO_FIELDS, vals)))
+        self._task = asyncio.create_task(self._flush_loop())
+        return len(rows)
+
+    def record(self, key: str, geo: dict, via: str | None):
+        self._pending[key] = (geo, via)
+        self.record_hit(key)
+
+    def record_hit(self, key: str):
+        self._hits[key] = self._hits.get(key, 0) + 1
+        if len(self._pending) + len(self._hits) >= self.FLUSH_BATCH:
+            self._wake.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[WARN] geocode store flush failed: {e}")
+
+    async def flush(self):
+        if not (self._pending or self._hits) or self._conn is None:
+            return
+        pending, hits = self._pending, self._hits
+        self._pending, self._hits = {}, {}
+        await self._run(self._flush_sync, pending, hits)
+
+    def _flush_sync(self, pending: dict, hits: dict):
+        now = time.time()
+        upserts = [
+            (key, *(geo.get(f) for f in self.GEO_FIELDS), via, hits.pop(key, 0), now)
+            for key, (geo, via) in pending.items()
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO geocode (query, name, latitude, longitude, country, admin1, timezone,"
+                " resolved_via, hits, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?)"
+                " ON CONFLICT(query) DO UPDATE SET name=excluded.name, latitude=excluded.latitude,"
+                " longitude=excluded.longitude, country=excluded.country, admin1=excluded.admin1,"
+                " timezone=excluded.timezone, resolved_via=excluded.resolved_via,"
+                " hits=geocode.hits+excluded.hits, updated_at=excluded.updated_at",
+                upserts,
+            )
+            self._conn.executemany(
+                "UPDATE geocode SET hits = hits + ? WHERE query = ?",
+                [(n, key) for key, n in hits.items()],
+            )
+
+    def _top_sync(self, n: int) -> list[tuple]:
+        return self._conn.execute(
+            "SELECT query, name, resolved_via, hits FROM geocode ORDER BY hits DESC LIMIT ?", (n,)
+        ).fetchall()
+
+    async def top(self, n: int = 10) -> list[tuple]:
+        """よく聞かれる地名（query, name, resolved_via, hits）"""
+        await self.flush()
+        return await self._run(self._top_sync, n)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._conn is not None:
+            await self.flush()
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+GEOCODE_DB_PATH = os.getenv("GEOCODE_DB_PATH")  # 未設定なら永続化しない
+geocode_store = GeocodeStore(GEOCODE_DB_PATH) if GEOCODE_DB_PATH else None
+
+# ---------- Place index ----------
+# よく聞かれる地名・ランドマーク・全県庁所在地は data/places.json から 1 回だけ読み込み、API を呼ばずに返す
+PLACES_PATH = os.getenv("PLACES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "places.json"))
+PLACE_SUFFIXES = ("駅", "市", "区", "府", "県")
+PLACE_PREFIX_MIN = 3  # 前方一致はこの文字数以上のときだけ（短いと誤爆する）
+_KATA_TO_HIRA = {c: c - 0x60 for c in range(ord("ァ"), ord("ヶ") + 1)}
+_PLACE_DROP = {ord(c): None for c in " ・･-‐"}
+
+def fold_place_name(name: str) -> str:
+    # NFKC（全角/半角）→ 小文字 → 区切り記号除去 → カタカナをひらがなに
+    s = unicodedata.normalize("NFKC", name).casefold().translate(_PLACE_DROP)
+    return s.translate(_KATA_TO_HIRA)
+
+def strip_place_suffix(folded: str) -> str:
+    for suf in PLACE_SUFFIXES:
+        if folded.endswith(suf) and len(folded) > len(suf):
+            return folded[:-len(suf)]
+    return folded
+
+class PlaceIndex:
+    """正規化した地名 → 座標 dict（オフラインで確定）または API に投げる正式名（str）"""
+
+    def __init__(self, entries: dict):
+        self._entries = entries
+        self._keys = sorted(entries)  # 前方一致用（二分探索）
+
+    @classmethod
+    def load(cls, path: str) -> "PlaceIndex":
+        try:
+            with open(path, encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] place index not loaded ({path}): {e}")
+            return cls({})
+        defaults = doc.get("defaults", {})
+        exact, base = {}, {}
+        for p in doc.get("places", []):
+            if "latitude" in p and "longitude" in p:
+                target = {
+                    "name": p["name"],
+                    "latitude": p["latitude"],
+                    "longitude": p["longitude"],
+                    "country": p.get("country", defaults.get("country")),
+                    "admin1": p.get("admin1"),
+                    "timezone": p.get("timezone", defaults.get("timezone")),
+                }
+            else:
+                target = p.get("query") or p["name"]
+            for n in [p["name"], *p.get("aliases", [])]:
+                folded = fold_place_name(n)
+                exact.setdefault(folded, target)
+                base.setdefault(strip_place_suffix(folded), target)
+        # 完全一致を優先し、接尾辞（駅/市/区）を落としたキーは空いているときだけ使う
+        for k, v in base.items():
+            exact.setdefault(k, v)
+        return cls(exact)
+
+    def lookup(self, query: str):
+        folded = fold_place_name(query)
+        hit = self._entries.get(folded)
+        if hit is None:
+            hit = self._entries.get(strip_place_suffix(folded))
+        if hit is None and len(folded) >= PLACE_PREFIX_MIN:
+            hit = self._prefix(folded)
+        return hit
+
+    def _prefix(self, folded: str):
+        # 同じ前方一致が複数の場所に割れるときは使わない
+        i = bisect.bisect_left(self._keys, folded)
+        found = None
+        for key in self._keys[i:i + 32]:
+            if not key.startswith(folded):
+                break
+            target = self._entries[key]
+            if found is not None and target != found:
+                return None
+            found = target
+        return found
+
+    def resolve(self, query: str) -> dict | None:
+        hit = self.lookup(query)
+        return dict(hit) if isinstance(hit, dict) else None
+
+    def canonical_query(self, query: str) -> str | None:
+        hit = self.lookup(query)
+        if isinstance(hit, str):
+            return hit
+        return hit["name"] if isinstance(hit, dict) else None
+
+    def __len__(self):
+        return len(self._entries)
+
+place_index = PlaceIndex.load(PLACES_PATH)
+
 async def geocode(session: aiohttp.ClientSession, query: str):
+    geo = place_index.resolve(query)
+    if geo is not None:
+        if geocode_store:
+            # 辞書で即答した地名も「よく聞かれる地名」に数える（大阪・東京などが top() から抜けないように）
+            geocode_store.record(normalize_query(query), geo, "index")
+        return geo
+    key = normalize_query(query)
+    cached = geocode_cache.get(key)
+    if cached is not TTLCache.MISS:
+        if cached is not None and geocode_store:
+            geocode_store.record_hit(key)
+        return cached
+    return await geocode_flight.do(key, lambda: _geocode_and_store(session, query, key))
+
+async def _geocode_and_store(session: aiohttp.ClientSession, query: str, key: str):
+    geo, definitive, via = await _geocode_remote(session, query)
+    if geo is None and not definitive:
+        stale = geocode_cache.peek_stale(key)
+        if stale is not TTLCache.MISS and stale is not None:
+            metrics.incr("stale_served.geocode")
+            return stale
+    # 上流エラーを含む「見つからない」はキャッシュしない（一時的な障害を固定化しない）
+    if geo is not None or definitive:
+        geocode_cache.set(key, geo)
+    if geo is not None and geocode_store:
+        geocode_store.record(key, geo, via)
+    return geo
+
+async def _geocode_remote(session: aiohttp.ClientSession, query: str) -> tuple[dict | None, bool, str | None]:
+    # 戻り値: (場所, 「見つからない」が確定か, ヒットした候補クエリ)
     def pick_best(results: list[dict]) -> dict | None:
         if not results:
             return None
@@ -50,71 +776,294 @@ async def geocode(session: aiohttp.ClientSession, query: str):
         return results[0]
 
     async def search(name: str):
-        url = "https://geocoding-api.open-meteo.com/v1/search"
+        url = GEOCODE_URL
         params = {"name": name, "count": 10, "language": "ja", "format": "json"}
-        headers = {"User-Agent": USER_AGENT}
-        async with session.get(url, params=params, headers=headers, timeout=15) as resp:
-            if resp.status != 200:
-                return []
-            data = await resp.json()
-            return data.get("results", []) or []
-
-    alias = {
-        "USJ": "ユニバーサル・スタジオ・ジャパン",
-        "ユニバ": "ユニバーサル・スタジオ・ジャパン",
-        "ディズニー": "東京ディズニーランド",
-        "ディズニーランド": "東京ディズニーランド",
-        "ディズニーシー": "東京ディズニーシー",
-        "TDL": "東京ディズニーランド",
-        "TDS": "東京ディズニーシー",
-        "梅田": "大阪市 梅田",
-        "なんば": "大阪市 なんば",
-        "心斎橋": "大阪市 心斎橋",
-        "通天閣": "大阪市 通天閣",
-        "天王寺": "大阪市 天王寺",
-        "スカイツリー": "東京スカイツリー",
-        "東京駅": "東京駅",
-        "浅草": "台東区 浅草",
-        "秋葉原": "千代田区 秋葉原",
-        "横浜中華街": "横浜市 中区",
-    }
-    romaji = {
-        "大阪": "Osaka", "京都": "Kyoto", "札幌": "Sapporo", "名古屋": "Nagoya",
-        "福岡": "Fukuoka", "神戸": "Kobe", "横浜": "Yokohama", "仙台": "Sendai",
-        "千葉": "Chiba", "川崎": "Kawasaki", "さいたま": "Saitama", "那覇": "Naha",
-        "広島": "Hiroshima", "金沢": "Kanazawa",
-    }
+        data = await upstream.get_json(session, "geocode", url, params)
+        if data is None:
+            return None
+        return data.get("results", []) or []
 
+    # エイリアス/ローマ字は place_index（data/places.json）に移した。ここでは表記ゆれの候補だけ作る
     trials = [query]
-    if query in alias:
-        trials.append(alias[query])
+    canonical = place_index.canonical_query(query)
+    if canonical:
+        trials.append(canonical)
     if not query.endswith(("市", "区", "町", "村")) and len(query) <= 4:
         trials.append(query + "市")
-    if query in romaji:
-        trials.append(romaji[query])
 
     seen, uniq_trials = set(), []
     for t in trials:
         if t not in seen:
             uniq_trials.append(t); seen.add(t)
 
+    def to_geo(chosen: dict) -> dict:
+        return {
+            "name": chosen.get("name"),
+            "latitude": chosen.get("latitude"),
+            "longitude": chosen.get("longitude"),
+            "country": chosen.get("country"),
+            "admin1": chosen.get("admin1"),
+            "timezone": chosen.get("timezone"),
+        }
+
+    definitive = True
+    if GEOCODE_PARALLEL and len(uniq_trials) > 1:
+        # ヘッジ：上位の候補が外れで終わるか GEOCODE_HEDGE_DELAY 秒たっても返らないときだけ次の候補を足し、
+        # 優先順に結果を見る。上位が当たったら下位はキャンセル（まだ投げていなければ呼び出しも起きない）
+        # → 遅い上流でも最悪レイテンシが「候補の合計」にならない
+        sem = asyncio.Semaphore(max(1, GEOCODE_MAX_PARALLEL))
+
+        async def attempt(name: str):
+            async with sem:
+                return await search(name)
+
+        def settled_hit():
+            # 優先順に見て、それより上がすべて外れで決着している当たりを返す（まだ分からなければ None）
+            for q, task in zip(uniq_trials, tasks):
+                if not task.done():
+                    return None
+                chosen = pick_best(task.result() or [])
+                if chosen:
+                    return to_geo(chosen), True, q
+            return None
+
+        tasks: list = []
+        try:
+            for q in uniq_trials[:-1]:
+                tasks.append(asyncio.create_task(attempt(q)))
+                # どれか 1 本終わるたびに決着を確かめる（上位の当たりを猶予の残りまで待たせない）
+                deadline = asyncio.get_running_loop().time() + GEOCODE_HEDGE_DELAY
+                pending = {t for t in tasks if not t.done()}
+                while pending:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    if remaining <= 0:
+                        break
+                    _, pending = await asyncio.wait(pending, timeout=remaining,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                    hit = settled_hit()
+                    if hit:
+                        return hit
+                hit = settled_hit()
+                if hit:
+                    return hit
+            tasks.append(asyncio.create_task(attempt(uniq_trials[-1])))
+            for q, task in zip(uniq_trials, tasks):
+                results = await task
+                if results is None:
+                    definitive = False
+                    continue
+                chosen = pick_best(results)
+                if chosen:
+                    return to_geo(chosen), True, q
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # 未回収の例外警告を出さない
+        return None, definitive, None
+
     for q in uniq_trials:
         results = await search(q)
+        if results is None:
+            definitive = False
+            continue
         chosen = pick_best(results)
         if chosen:
-            return {
-                "name": chosen.get("name"),
-                "latitude": chosen.get("latitude"),
-                "longitude": chosen.get("longitude"),
-                "country": chosen.get("country"),
-                "admin1": chosen.get("admin1"),
-                "timezone": chosen.get("timezone"),
-            }
-    return None
+            return to_geo(chosen), True, q
+    return None, definitive, None
 
 # ---------- Forecast ----------
-async def fetch_forecast(session: aiohttp.ClientSession, lat: float, lon: float, tz: str):
-    url = "https://api.open-meteo.com/v1/forecast"
+# 同じ格子（丸めた緯度経度）+TZ の予報は、次の毎時更新まではキャッシュから返す
+FORECAST_GRID_DEG = float(os.getenv("FORECAST_GRID_DEG", "0.05"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "512"))
+FORECAST_CACHE_MAX_BYTES = int(os.getenv("FORECAST_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+def forecast_weight(data: dict) -> int:
+    # hourly の値 1 個あたり ~32B としたざっくり見積り（正確さより速さ優先）
+    hourly = data.get("hourly") or {}
+    return 256 + 32 * sum(len(v) for v in hourly.values() if isinstance(v, list))
+
+forecast_cache = TTLCache(
+    FORECAST_CACHE_SIZE, 3600, max_weight=FORECAST_CACHE_MAX_BYTES, weigher=forecast_weight,
+)
+forecast_flight = SingleFlight()
+# 格子ごとに予報を取り直した通し番号（描画キャッシュのキーに入れ、古い予報で描いた返事を使い回さない）
+# 予報と同じ件数上限の LRU に入れ、格子が増えても無制限に育たないようにする（期限切れでも peek_stale で読む）
+forecast_versions = TTLCache(FORECAST_CACHE_SIZE, 3600)
+_forecast_serial = itertools.count(1)
+# 期限切れ（＝正時をまたいだ）予報もこの秒数まではすぐ返し、裏で取り直す。0 なら待って取り直す。
+# forecast_window の余裕 1 本があるので、1 時間古い予報でも頼まれた時間数は足りる
+FORECAST_STALE_MAX = float(os.getenv("FORECAST_STALE_MAX", "3600"))
+# 必要な時間帯だけ取る（7日分→数時間分でペイロードが1桁以上小さくなる）
+FORECAST_WINDOWED = os.getenv("FORECAST_WINDOWED", "1") == "1"
+FORECAST_WINDOW_MIN = int(os.getenv("FORECAST_WINDOW_MIN", "6"))
+
+def grid_key(lat: float, lon: float, tz: str | None) -> tuple:
+    step = FORECAST_GRID_DEG
+    return (round(round(lat / step) * step, 4), round(round(lon / step) * step, 4), tz or "Asia/Tokyo")
+
+def seconds_until_next_hour(now: datetime | None = None) -> float:
+    now = now or datetime.now(JST)
+    nxt = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max(1.0, (nxt - now).total_seconds())
+
+def forecast_window(hours: int) -> int:
+    # 「今の時刻の行」+ 余裕 1 本を足して 6 時間単位に切り上げ（キャッシュを使い回しやすくする）
+    need = max(hours + 2, FORECAST_WINDOW_MIN)
+    return -(-need // 6) * 6
+
+def hourly_len(data) -> int:
+    return len(((data or {}).get("hourly") or {}).get("time") or [])
+
+async def fetch_forecast(session: aiohttp.ClientSession, lat: float, lon: float, tz: str,
+                         hours: int | None = None):
+    # hours を渡すと必要な時間だけを取る（forecast_hours）。None なら従来どおり全期間
+    window = forecast_window(hours) if (hours and FORECAST_WINDOWED) else None
+    key = grid_key(lat, lon, tz)
+    hot_places.record(key, lat, lon, tz, hours or DEFAULT_HOURS)
+    cached = forecast_cache.get(key)
+    if cached is not TTLCache.MISS and (window is None or hourly_len(cached) >= window):
+        return cached
+    flight = lambda: forecast_flight.do(
+        (key, window), lambda: _fetch_forecast_and_store(session, lat, lon, tz, key, window),
+    )
+    if FORECAST_STALE_MAX > 0:
+        stale = forecast_cache.get_stale(key, FORECAST_STALE_MAX)
+        if stale is not TTLCache.MISS and (window is None or hourly_len(stale) >= window):
+            # 古い予報をすぐ返し、取り直しは裏で 1 本だけ（同じ格子の後続も single-flight に相乗り）
+            metrics.incr("swr.forecast")
+            spawn_background(flight())
+            return stale
+    return await flight()
+
+def store_forecast(key, data: dict, share: bool = True):
+    ttl = seconds_until_next_hour()
+    forecast_cache.set(key, data, ttl=ttl)
+    forecast_versions.set(key, next(_forecast_serial))
+    if share and shared_forecasts:
+        shared_forecasts.put(key, data, ttl)
+
+def usable(data, window: int | None) -> bool:
+    return bool(data) and (window is None or hourly_len(data) >= window)
+
+class SharedForecastStore:
+    """複数プロセス（シャード）で予報を共有する SQLite ストア。期限は壁時計で持つ（プロセス間で比べるため）
+
+    SQLite 操作はすべて専用スレッドで行い、書き込みは待たずに投げる。
+    """
+
+    PRUNE_AFTER = 24 * 3600  # 起動時にこれより古い行を捨てる
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forecast-store")
+        self._conn: sqlite3.Connection | None = None
+        self.hits = 0
+        self.misses = 0
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    @staticmethod
+    def cell(key: tuple) -> str:
+        return "{},{},{}".format(*key)
+
+    def _open_sync(self):
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS forecast (cell TEXT PRIMARY KEY, body TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        with self._conn:
+            self._conn.execute("DELETE FROM forecast WHERE expires_at < ?", (time.time() - self.PRUNE_AFTER,))
+
+    async def open(self):
+        await self._run(self._open_sync)
+
+    def _get_sync(self, cell: str, now: float):
+        row = self._conn.execute(
+            "SELECT body FROM forecast WHERE cell = ? AND expires_at > ?", (cell, now)
+        ).fetchone()
+        return json_loads(row[0]) if row else None
+
+    async def get(self, key: tuple) -> dict | None:
+        if self._conn is None:
+            return None
+        try:
+            data = await self._run(self._get_sync, self.cell(key), time.time())
+        except (sqlite3.Error, *JSON_ERRORS) as e:
+            print(f"[WARN] shared forecast read failed: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def _put_sync(self, cell: str, data: dict, expires_at: float):
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO forecast (cell, body, expires_at) VALUES (?,?,?)"
+                    " ON CONFLICT(cell) DO UPDATE SET body=excluded.body, expires_at=excluded.expires_at",
+                    (cell, json.dumps(data, separators=(",", ":")), expires_at),
+                )
+        except sqlite3.Error as e:
+            print(f"[WARN] shared forecast write failed: {e}")
+
+    def put(self, key: tuple, data: dict, ttl: float):
+        if self._conn is not None:
+            self._executor.submit(self._put_sync, self.cell(key), data, time.time() + ttl)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": 0, "weight": 0, "hits": self.hits, "misses": self.misses, "evictions": 0,
+                "hit_ratio": (self.hits / total) if total else 0.0}
+
+    async def close(self):
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+# 複数プロセスでシャードを分けるときは、全プロセスで同じパスを指す（未設定なら共有しない）
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+shared_forecasts = SharedForecastStore(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+
+async def _fetch_forecast_and_store(session: aiohttp.ClientSession, lat: float, lon: float, tz: str,
+                                    key, window: int | None):
+    if shared_forecasts:
+        # 別のプロセスがこの正時にもう取っていればそれを使う
+        shared = await shared_forecasts.get(key)
+        if usable(shared, window):
+            store_forecast(key, shared, share=False)
+            return shared
+    try:
+        data = await _fetch_forecast_remote(session, lat, lon, tz, window)
+        if window is not None and data is not None and not hourly_len(data):
+            # 窓が空で返ってきたら全期間で取り直す
+            data = await _fetch_forecast_remote(session, lat, lon, tz, None)
+    except UpstreamBusy:
+        data = None
+        if forecast_cache.peek_stale(key) is TTLCache.MISS:
+            raise
+    if data and "hourly" in data:
+        store_forecast(key, data)
+        return data
+    # 上流が落ちている間は、期限切れでも手元の予報を返す（無いよりまし）
+    stale = forecast_cache.peek_stale(key)
+    if stale is not TTLCache.MISS:
+        metrics.incr("stale_served.forecast")
+        return stale
+    return data
+
+async def _fetch_forecast_remote(session: aiohttp.ClientSession, lat: float, lon: float, tz: str,
+                                 window: int | None = None):
+    return await upstream.get_json(session, "forecast", FORECAST_URL, forecast_params(lat, lon, tz, window))
+
+def forecast_params(lat, lon, tz: str, window: int | None) -> dict:
+    # lat/lon はカンマ区切り文字列でもよい（複数地点を 1 リクエストで取る）
     params = {
         "latitude": lat, "longitude": lon,
         "hourly": (
@@ -123,11 +1072,157 @@ async def fetch_forecast(session: aiohttp.ClientSession, lat: float, lon: float,
         ),
         "timezone": tz or "Asia/Tokyo"
     }
-    headers = {"User-Agent": USER_AGENT}
-    async with session.get(url, params=params, headers=headers, timeout=15) as resp:
-        if resp.status != 200:
-            return None
-        return await resp.json()
+    if window is not None:
+        # forecast_hours は「現在時刻の行」から数える
+        params["forecast_hours"] = window
+    return params
+
+async def fetch_forecast_batch(session: aiohttp.ClientSession, geos: list[dict], hours: int,
+                               track: bool = True) -> list:
+    """複数地点の予報。キャッシュに無い格子だけを TZ ごとに 1 本の複数座標リクエストにまとめる"""
+    window = forecast_window(hours) if FORECAST_WINDOWED else None
+    out: list = [None] * len(geos)
+    groups: dict = {}  # tz -> {grid_key: [geos の添字]}
+    for i, geo in enumerate(geos):
+        key = grid_key(geo["latitude"], geo["longitude"], geo["timezone"])
+        if track:
+            hot_places.record(key, geo["latitude"], geo["longitude"], geo["timezone"], hours)
+        cached = forecast_cache.get(key)
+        if cached is not TTLCache.MISS and (window is None or hourly_len(cached) >= window):
+            out[i] = cached
+            continue
+        groups.setdefault(geo["timezone"] or "Asia/Tokyo", {}).setdefault(key, []).append(i)
+
+    if shared_forecasts and groups:
+        cells = [(tz, key) for tz, keys in groups.items() for key in keys]
+        found = await asyncio.gather(*(shared_forecasts.get(key) for _, key in cells))
+        for (tz, key), d in zip(cells, found):
+            if usable(d, window):
+                store_forecast(key, d, share=False)
+                for i in groups[tz].pop(key):
+                    out[i] = d
+        groups = {tz: keys for tz, keys in groups.items() if keys}
+
+    async def run(tz: str, cells: dict):
+        keys = list(cells)
+        firsts = [geos[cells[k][0]] for k in keys]
+        params = forecast_params(
+            ",".join(str(g["latitude"]) for g in firsts),
+            ",".join(str(g["longitude"]) for g in firsts),
+            tz, window,
+        )
+        try:
+            data = await upstream.get_json(session, "forecast", FORECAST_URL, params)
+        except UpstreamBusy:
+            data = None
+        # 1 地点なら dict、複数なら地点順の list で返ってくる
+        datas = (data if isinstance(data, list) else [data]) if data else []
+        datas += [None] * (len(keys) - len(datas))
+        for key, d in zip(keys, datas):
+            if d and hourly_len(d):
+                store_forecast(key, d)
+            else:
+                stale = forecast_cache.peek_stale(key)
+                d = None if stale is TTLCache.MISS else stale
+            for i in cells[key]:
+                out[i] = d
+
+    metrics.incr("forecast.batch_requests", len(groups))
+    await asyncio.gather(*(run(tz, cells) for tz, cells in groups.items()))
+    return out
+
+_background: set = set()
+
+def spawn_background(coro, what: str = "refresh"):
+    # 参照を持っておかないとタスクが GC で消えることがある
+    async def guarded():
+        try:
+            await coro
+        except Exception as e:
+            print(f"[WARN] background {what} failed: {e}")
+    task = asyncio.create_task(guarded())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+# ---------- Hot places ----------
+# よく聞かれる格子を数えておき、毎時の更新直後に上位だけ先回りで取り直す（大阪・東京が冷えた上流を待たない）
+HOT_REFRESH_TOP = int(os.getenv("HOT_REFRESH_TOP", "20"))        # 0 で先回りしない
+HOT_REFRESH_DELAY = float(os.getenv("HOT_REFRESH_DELAY", "15"))  # 正時から何秒後に取り直すか
+HOT_TRACK_MAX = 1024
+
+class HotPlaces:
+    """格子 → (回数, 座標, 最大時間数)。毎時半減させるので「最近よく聞かれる所」が上に来る"""
+
+    def __init__(self, max_entries: int = HOT_TRACK_MAX):
+        self.max_entries = max_entries
+        self._counts: dict = {}  # grid_key -> [count, lat, lon, tz, hours]
+
+    def record(self, key, lat: float, lon: float, tz: str | None, hours: int):
+        entry = self._counts.get(key)
+        if entry is None:
+            if len(self._counts) >= self.max_entries:
+                self._prune()
+            self._counts[key] = [1, lat, lon, tz, hours]
+        else:
+            entry[0] += 1
+            entry[4] = max(entry[4], hours)
+
+    def top(self, n: int) -> list[tuple]:
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(key, *entry) for key, entry in ranked]
+
+    def decay(self):
+        self._counts = {k: e for k, e in self._counts.items() if e[0] > 1}
+        for e in self._counts.values():
+            e[0] //= 2
+
+    def _prune(self):
+        # あふれたら下位半分を捨てる（たまにしか走らない）
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        self._counts = dict(ranked[:self.max_entries // 2])
+
+    def __len__(self):
+        return len(self._counts)
+
+hot_places = HotPlaces()
+
+class HotRefresher:
+    """毎時 HOT_REFRESH_DELAY 秒に起きて、人気の格子の予報をまとめて取り直す"""
+
+    def __init__(self, bot: "WeatherBot", places: HotPlaces, top: int = HOT_REFRESH_TOP):
+        self.bot = bot
+        self.places = places
+        self.top = top
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.top > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(seconds_until_next_hour() + HOT_REFRESH_DELAY)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[WARN] hot refresh failed: {e}")
+            self.places.decay()
+
+    async def refresh(self) -> int:
+        hot = self.places.top(self.top)
+        if not hot:
+            return 0
+        geos = [{"latitude": lat, "longitude": lon, "timezone": tz} for _, _, lat, lon, tz, _ in hot]
+        # 期限切れの格子だけが TZ ごとの複数座標リクエストにまとまる。先回り分は人気に数えない
+        await fetch_forecast_batch(self.bot.session, geos, max(h for *_, h in hot), track=False)
+        metrics.incr("refresh.hot", len(hot))
+        return len(hot)
 
 # ---------- Emoji ----------
 WEATHER_EMOJI = {
@@ -167,66 +1262,205 @@ def categorize_time(rows):
 
 # ---------- AA ----------
 AA = ["|ω・)", "(/ω＼)", "( ´ ▽ ` )", "(￣▽￣;)", "(｀・ω・´)", "( ˘ω˘ )", "(｡･ω･｡)", "(；・∀・)", "(・∀・)", "(>_<)"]
-def maybe_aa(p=0.75):
-    return (" " + random.choice(AA)) if random.random() < p else ""
+def maybe_aa(p=0.75, rng=random):
+    return (" " + rng.choice(AA)) if rng.random() < p else ""
+
+AA_MARK = re.compile(r"\(|\||／")
 
-def ensure_aa(s: str) -> str:
-    if re.search(r"\(|\||／", s):  # 既にAAらしき記号がある
+def has_aa(s: str) -> bool:
+    return AA_MARK.search(s) is not None
+
+def ensure_aa(s: str, rng=random) -> str:
+    if has_aa(s):  # 既にAAらしき記号がある
         return s
-    return s + maybe_aa()
+    return s + maybe_aa(rng=rng)
+
+# ---------- 方言パック ----------
+# コメント文は data/comments/<方言>.json、都道府県→方言の対応は data/comments/index.json。
+# パックはその方言が初めて選ばれたときに読み込み、ファイルが更新されたら再起動なしで差し替える
+COMMENTS_DIR = os.getenv("COMMENTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "comments"))
+COMMENTS_CHECK_INTERVAL = float(os.getenv("COMMENTS_CHECK_INTERVAL", "30"))  # 更新確認の間隔秒（0 で確認しない）
+COMMENT_VARIANTS = 3  # 1 マスあたりのバリエーション数
+WEATHER_KEYS = ("sunny","cloudy","rain","snow","thunder")  # categorize_weather の戻り値
+PACK_WEATHER_KEYS = ("sunny","cloudy","rain","snow")      # パックに主文を持つ天気（thunder は汎用文＋雷の尾）
+TEMP_KEYS = ("hot","warm","cool","cold")
+TIMEBANDS = ("morning","day","evening","night")
 
-# ---------- 方言キー ----------
-DIALECTS = ["kanto","kansai","tohoku","chugoku","kyushu"]
+def validate_pack(pack, dialect: str) -> list[str]:
+    """天気×気温×バリエ・時間帯・雷の尾がそろっているかを調べ、足りないマスを返す（空なら OK）"""
+    if not isinstance(pack, dict):
+        return ["top level is not an object"]
+    problems = []
+    if pack.get("dialect") != dialect:
+        problems.append(f"dialect is {pack.get('dialect')!r}, expected {dialect!r}")
+
+    def check(where: str, variants):
+        if not isinstance(variants, list) or len(variants) < COMMENT_VARIANTS:
+            problems.append(f"{where}: needs {COMMENT_VARIANTS} variants")
+        elif not all(isinstance(v, str) and v.strip() for v in variants):
+            problems.append(f"{where}: empty variant")
+
+    def section(block, key):
+        value = block.get(key) if isinstance(block, dict) else None
+        return value if isinstance(value, dict) else {}
+
+    base = section(pack, "base")
+    for w in PACK_WEATHER_KEYS:
+        cells = section(base, w)
+        for t in TEMP_KEYS:
+            check(f"base.{w}.{t}", cells.get(t))
+    tails = section(pack, "tails")
+    for b in TIMEBANDS:
+        check(f"tails.{b}", tails.get(b))
+    check("thunder", pack.get("thunder"))
+    return problems
 
 def pick_dialect_key(place: dict) -> str:
-    pref = (place.get("admin1") or "").strip()
-    if pref in ["大阪府","京都府","兵庫県","滋賀県","奈良県","和歌山県"]:
-        return "kansai"
-    if pref in ["青森県","岩手県","宮城県","秋田県","山形県","福島県"]:
-        return "tohoku"
-    if pref in ["広島県","岡山県","山口県","鳥取県","島根県"]:
-        return "chugoku"
-    if pref in ["福岡県","佐賀県","長崎県","熊本県","大分県","宮崎県","鹿児島県"]:
-        return "kyushu"
-    # それ以外は中立（関東）
-    return "kanto"
+    # data/comments/index.json に載っていない県は中立（関東）
+    return engine.dialect_for((place.get("admin1") or "").strip())
 
 # ---------- コメントエンジン（方言別プリセット） ----------
 class CommentEngine:
-    def __init__(self):
-        # 主文：方言→天気→気温→バリエ3
-        self.base = self._build_bases()
-        # 追いコメント：方言→時間帯→候補
-        self.tails = self._build_tails()
-        # 雷用の追加尾
-        self.thunder_tails = {
-            "kanto": ["雷に注意して、無理せずね", "稲光が見えたら屋内に避難しよう", "安全第一で、計画は柔軟に"],
-            "kansai": ["雷は要注意や、無理せんときや", "ピカッと来たら屋内に避難しよ", "安全第一で、予定は柔軟にいこ"],
-            "tohoku": ["雷気をつけっぺな", "光ったら屋内さ入ろう", "無理せず安全第一だべ"],
-            "chugoku": ["雷に気ぃつけんさい", "光ったら屋内へ避難しんさい", "安全第一で無理はせんのんよ"],
-            "kyushu": ["雷には気をつけんね", "ピカッと来たら屋内に避難しとき", "安全第一たい"],
-        }
+    """方言パックを初回利用時に読み込み、フォールバック解決済みのフラットな表にして持つ"""
 
-    def get(self, dialect: str, weather: str, temp: str, timeband: str, has_thunder: bool) -> str:
-        d = dialect if dialect in DIALECTS else "kanto"
-        # 1) 主文（方言内→kantoの順にフォールバック）
-        text = self._pick_base(d, weather, temp)
+    def __init__(self, root: str = COMMENTS_DIR, check_interval: float = COMMENTS_CHECK_INTERVAL):
+        self.root = root
+        self.check_interval = check_interval
+        self._mtimes = {}   # 読んだファイル → mtime（更新検知用）
+        self._packs = {}    # 方言 → 検証済みパック（読めなかったら None）
+        self._tables = {}   # 方言 → (主文表, 追いコメント表, 雷の尾)
+        self._next_check = time.monotonic() + check_interval
+        self.default = "kanto"
+        self.dialects = (self.default,)
+        self._by_pref = {}
+        self._load_index()
+
+    def dialect_for(self, pref: str) -> str:
+        return self._by_pref.get(pref, self.default)
+
+    def get(self, dialect: str, weather: str, temp: str, timeband: str, has_thunder: bool,
+            rng: random.Random | None = None) -> str:
+        # rng を渡すとその乱数列だけで文を選ぶ（同じ種なら同じ文）。省略時はグローバルの random
+        rng = rng or random
+        if self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self.reload_changed()
+        base, tails, thunder = self._tables.get(dialect) or self._table(dialect)
+        # 1) 主文（方言内→既定の方言→汎用 は表を作るときに解決済み）
+        text, aa = self._pick(base.get((weather, temp)) or self._entry(self._resolve_base(dialect, weather, temp)), rng)
         # 2) 追いコメント（時間帯）
-        tail = self._pick_tail(d, timeband)
+        tail, tail_aa = self._pick(tails.get(timeband) or self._entry(self._resolve_tail(dialect, timeband)), rng)
         s = f"{text} {tail}".strip()
+        aa = aa or tail_aa
         # 3) 雷なら一言追加
         if has_thunder:
-            s += " " + random.choice(self.thunder_tails[d])
-        # 4) AA（重複防止）
-        return ensure_aa(s)
+            extra, extra_aa = self._pick(thunder, rng)
+            s += " " + extra
+            aa = aa or extra_aa
+        # 4) AA（重複防止）：各文に AA が入っているかは表に記録済みなので正規表現は走らせない
+        return s if aa else s + maybe_aa(rng=rng)
+
+    def pack(self, dialect: str) -> dict | None:
+        if dialect not in self._packs:
+            self._packs[dialect] = self._read_pack(dialect) if dialect in self.dialects else None
+        return self._packs[dialect]
+
+    def reload_changed(self) -> list[str]:
+        """更新されたファイルだけ読み直す。壊れたパックは警告して前の版を使い続ける"""
+        self._next_check = time.monotonic() + self.check_interval
+        changed = [p for p, m in self._mtimes.items() if self._mtime(p) != m]
+        if not changed:
+            return []
+        index_path = self._path("index")
+        if index_path in changed:
+            self._load_index()
+            # 対応表から外れた方言・新しく載った方言は次に選ばれたときに読み直す
+            self._packs = {d: p for d, p in self._packs.items() if p is not None and d in self.dialects}
+        for d in list(self._packs):
+            if self._path(d) in changed:
+                fresh = self._read_pack(d) if d in self.dialects else None
+                if fresh is not None or d not in self.dialects:
+                    self._packs[d] = fresh
+        self._tables.clear()  # 既定の方言が変わると他の方言のフォールバックも変わるので全部作り直す
+        print(f"[INFO] comment packs reloaded: {', '.join(os.path.basename(p) for p in changed)}")
+        return changed
 
     # ---- 内部 ----
-    def _pick_base(self, dialect: str, weather: str, temp: str) -> str:
-        # フォールバック順：その方言→kanto→最後は汎用文
-        for d in [dialect, "kanto"]:
-            block = self.base.get(d, {}).get(weather, {}).get(temp, [])
+    @staticmethod
+    def _pick(entry: tuple, rng=random) -> tuple:
+        # 候補 1 つ（汎用フォールバック）のときは乱数を消費しない
+        return entry[0] if len(entry) == 1 else rng.choice(entry)
+
+    @staticmethod
+    def _entry(candidates: list[str]) -> tuple:
+        return tuple((c, has_aa(c)) for c in candidates)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.json")
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self, name: str):
+        path = self._path(name)
+        # 読めなくても mtime は覚えておき、直るまで毎回警告しないようにする
+        self._mtimes[path] = self._mtime(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] comment file not loaded ({path}): {e}")
+            return None
+
+    def _load_index(self):
+        doc = self._read("index")
+        if not isinstance(doc, dict):
+            return
+        prefectures = doc.get("prefectures", {})
+        self.default = doc.get("default", "kanto")
+        self.dialects = (self.default, *(d for d in prefectures if d != self.default))
+        self._by_pref = {p: d for d, prefs in prefectures.items() for p in prefs}
+
+    def _read_pack(self, dialect: str) -> dict | None:
+        pack = self._read(dialect)
+        if pack is None:
+            return None
+        problems = validate_pack(pack, dialect)
+        if problems:
+            more = f" (+{len(problems) - 3} more)" if len(problems) > 3 else ""
+            print(f"[WARN] comment pack {dialect} rejected: {'; '.join(problems[:3])}{more}")
+            return None
+        return pack
+
+    def _chain(self, dialect: str) -> list[dict]:
+        # フォールバック順：その方言→既定の方言（どちらも読めなければ汎用文だけ）。
+        # 検証済みのパックはマスが全部そろっているので、読めた方言があれば既定の方言は読まない
+        for name in (dialect, self.default):
+            pack = self.pack(name)
+            if pack is not None:
+                return [pack]
+        return []
+
+    def _table(self, dialect: str) -> tuple:
+        # 主文 (天気, 気温) / 追いコメント 時間帯 / 雷の尾 → ((文, AA入りか), ...)
+        chain = self._chain(dialect)
+        base = {
+            (w, t): self._entry(self._resolve_base(dialect, w, t, chain))
+            for w in WEATHER_KEYS for t in TEMP_KEYS
+        }
+        tails = {b: self._entry(self._resolve_tail(dialect, b, chain)) for b in TIMEBANDS}
+        thunder = next((p["thunder"] for p in chain), ["雷に注意して、安全第一でね"])
+        table = self._tables[dialect] = (base, tails, self._entry(thunder))
+        return table
+
+    def _resolve_base(self, dialect: str, weather: str, temp: str, chain: list[dict] | None = None) -> list[str]:
+        for pack in self._chain(dialect) if chain is None else chain:
+            block = pack["base"].get(weather, {}).get(temp, [])
             if block:
-                return random.choice(block)
+                return block
         # 最終フォールバック（絶対に矛盾しない汎用）
         generic = {
             "sunny": "晴れてるよ、体調に合わせて無理なく過ごそう",
@@ -234,669 +1468,418 @@ class CommentEngine:
             "rain": "雨の気配あり、傘があると安心だよ",
             "snow": "雪の可能性あり、足元に注意してね",
         }
-        return generic.get(weather, "今日は穏やかにいこう")
+        return [generic.get(weather, "今日は穏やかにいこう")]
 
-    def _pick_tail(self, dialect: str, timeband: str) -> str:
-        for d in [dialect, "kanto"]:
-            block = self.tails.get(d, {}).get(timeband, [])
+    def _resolve_tail(self, dialect: str, timeband: str, chain: list[dict] | None = None) -> list[str]:
+        for pack in self._chain(dialect) if chain is None else chain:
+            block = pack["tails"].get(timeband, [])
             if block:
-                return random.choice(block)
+                return block
         # 最終フォールバック
-        return {"morning":"朝はゆっくり準備しよう",
-                "day":"日中はこまめに休憩ね",
-                "evening":"夕方は早めに切り上げよう",
-                "night":"夜は安全第一でね"}.get(timeband, "")
-
-    def _build_bases(self):
-        # 短め・自然・矛盾なし。各3バリ。
-        # weather: sunny/cloudy/rain/snow
-        # temp: hot/warm/cool/cold
-        return {
-            "kanto": {
-                "sunny": {
-                    "hot": [
-                        "強い日差しで暑いね、水分と日陰休憩を忘れずに",
-                        "かなり暑いよ、帽子と日焼け対策もしっかりね",
-                        "暑さが厳しいから、無理せず涼しい場所を使おう",
-                    ],
-                    "warm": [
-                        "過ごしやすい晴れ、外の用事がはかどりそう",
-                        "穏やかな陽気だね、洗濯や散歩にちょうどいい",
-                        "心地よい晴れ、動くなら今がいいタイミング",
-                    ],
-                    "cool": [
-                        "ひんやり晴れ、薄手の上着があると安心",
-                        "空気は涼しめ、体を冷やしすぎないようにね",
-                        "日差しはあるけど体感は低め、服装で調整しよう",
-                    ],
-                    "cold": [
-                        "快晴でも冷えるよ、手袋やマフラーが役立つ",
-                        "空気が冷たい、重ね着で温かくしていこう",
-                        "放射冷却で冷え込みやすい、油断しないでね",
-                    ],
-                },
-                "cloudy": {
-                    "hot": [
-                        "雲は多いけど蒸し暑い、こまめに水分を",
-                        "蒸し暑さが残るね、風通しの良い服装で",
-                        "日差しは弱めでも暑いよ、無理はしないで",
-                    ],
-                    "warm": [
-                        "雲多めで動きやすい、屋外作業も負担少なめ",
-                        "熱がこもりにくくて快適、今のうちに用事を進めよう",
-                        "穏やかな曇り、外回りもしやすいね",
-                    ],
-                    "cool": [
-                        "ひんやり曇り、羽織が一枚あるとちょうどいい",
-                        "体感は低め、首元を温めると楽だよ",
-                        "日差しがない分冷える、長居はほどほどに",
-                    ],
-                    "cold": [
-                        "曇りで冷えるね、厚手の上着でしっかり防寒",
-                        "底冷えしそう、温かい飲み物で体を守ろう",
-                        "暗くなると一段と寒い、早めに帰るのが安心",
-                    ],
-                },
-                "rain": {
-                    "hot": [
-                        "蒸し暑い雨、通気性の良いレインウェアが楽だよ",
-                        "汗と雨で冷えやすい、タオルや替えのシャツがあると安心",
-                        "小雨の合間をうまく使って動こう",
-                    ],
-                    "warm": [
-                        "雨でも気温は高め、ムレ対策をしていこう",
-                        "荷物は撥水だと安心、傘は忘れずにね",
-                        "出入りでムワッとするから、体調に気をつけて",
-                    ],
-                    "cool": [
-                        "ひんやり雨、傘は必須だよ",
-                        "濡れると体が冷える、タオルを一枚持っておこう",
-                        "屋内に逃げ場を作っておくと楽だよ",
-                    ],
-                    "cold": [
-                        "冷たい雨、手袋や防水の靴が役立つよ",
-                        "体温を奪われやすい、無理せずにいこう",
-                        "風が強いときは合羽があると快適さが違う",
-                    ],
-                },
-                "snow": {
-                    "hot": [
-                        "珍しい雪の条件だね、足元最優先でいこう",
-                        "気温は高めでも雪には注意、無理はしないで",
-                        "状況が変わりやすい、慎重に動こう",
-                    ],
-                    "warm": [
-                        "みぞれ気味で足元が悪い、水はねに注意しよう",
-                        "解けかけで滑りやすい、歩幅は小さめに",
-                        "濡れ冷えしやすいから、体温管理を忘れずに",
-                    ],
-                    "cool": [
-                        "小雪でひんやり、足元に気をつけよう",
-                        "視界が白っぽい、横断は慎重にね",
-                        "濡れた靴は冷える、替えの靴下があると安心",
-                    ],
-                    "cold": [
-                        "凍結が心配、時間に余裕を持って動こう",
-                        "転倒に注意、手袋と滑りにくい靴で",
-                        "日没後は危険度アップ、寄り道は控えめに",
-                    ],
-                },
-            },
-
-            "kansai": {
-                "sunny": {
-                    "hot": [
-                        "えらい暑いわ、水分と日陰休憩は忘れんときや",
-                        "ギラギラやで、帽子と日焼け止めもしっかりな",
-                        "無理せんと、涼しいとこ上手に使ってこ",
-                    ],
-                    "warm": [
-                        "ええ晴れや、外の用事サクッと片付けよか",
-                        "心地よい陽気やな、洗濯日和やで",
-                        "動くなら今がええタイミングや",
-                    ],
-                    "cool": [
-                        "ひんやり晴れや、薄手の上着あると安心やで",
-                        "日差しはあっても体感は低め、服で調整しよ",
-                        "朝晩は冷えるし、油断せんといてな",
-                    ],
-                    "cold": [
-                        "快晴でも冷えるわ、手袋やマフラー用意しとき",
-                        "空気きんと冷たい、重ね着でぬくぬくいこ",
-                        "放射冷却で冷え込みやすいさかい、要注意や",
-                    ],
-                },
-                "cloudy": {
-                    "hot": [
-                        "曇ってても蒸し暑いわ、こまめに水分な",
-                        "日差し弱めでも暑いで、無理は禁物や",
-                        "風通しのええ服でいこか",
-                    ],
-                    "warm": [
-                        "雲多めで動きやすい、今のうちに用事やってまお",
-                        "熱こもりにくくて快適や、外回りもしやすいで",
-                        "ええ感じの曇りやな、サクサク動けそうや",
-                    ],
-                    "cool": [
-                        "ひんやり曇り、羽織一枚あると楽やで",
-                        "日差しないぶん冷える、首元あっためよ",
-                        "長居はほどほどにしとこ",
-                    ],
-                    "cold": [
-                        "曇りで底冷えするで、厚めの上着でいこ",
-                        "温かい飲みもんで体守っとこな",
-                        "暗なると一段と寒い、早めに帰るんが安心や",
-                    ],
-                },
-                "rain": {
-                    "hot": [
-                        "蒸し雨や、通気性ええレインウェアが楽やで",
-                        "汗と雨で冷えやすいし、タオルと替えシャツ用意な",
-                        "小雨の合間うまく使って動こ",
-                    ],
-                    "warm": [
-                        "雨でも気温は高め、ムレ対策忘れんといて",
-                        "荷物は撥水が安心や、傘も忘れずにな",
-                        "出入りでムワッと来るし、体調気ぃつけてな",
-                    ],
-                    "cool": [
-                        "ひんやり雨や、傘は必須やで",
-                        "濡れると体冷えるし、タオル持っとくと楽や",
-                        "屋内の逃げ場つくっとくと安心やで",
-                    ],
-                    "cold": [
-                        "冷たい雨や、手袋と防水靴が役立つで",
-                        "体温もってかれやすい、無理せんようにな",
-                        "風あれば合羽がだいぶ違うわ",
-                    ],
-                },
-                "snow": {
-                    "hot": [
-                        "珍しい雪の条件や、足元最優先でいこな",
-                        "気温は高めでも雪は要注意やで",
-                        "状況変わりやすいし、慎重に動こ",
-                    ],
-                    "warm": [
-                        "みぞれ気味で足元グズグズや、水はね注意な",
-                        "解けかけで滑るで、歩幅は小さめにな",
-                        "濡れ冷えしやすいし、体温管理してこ",
-                    ],
-                    "cool": [
-                        "小雪でひんやり、足元気ぃつけてな",
-                        "視界白っぽいし、横断は慎重にやで",
-                        "靴濡れると冷えるわ、替え靴下あると安心や",
-                    ],
-                    "cold": [
-                        "凍結こわいし、時間に余裕持って動こ",
-                        "転倒注意や、滑りにくい靴と手袋をな",
-                        "日没後は危険度上がるし、寄り道控えめで",
-                    ],
-                },
-            },
-
-            "tohoku": {
-                "sunny": {
-                    "hot": [
-                        "暑いっちゃね、水分と日陰で休みながらいぐべ",
-                        "日差しつよいがら、帽子と日焼け対策大事だべ",
-                        "無理すんなよ、涼しいとこ使っていこう",
-                    ],
-                    "warm": [
-                        "穏やかな晴れだべ、用事進めるなら今だな",
-                        "過ごしやすくていい日だね、洗濯日和だべ",
-                        "動くにはちょうどいい陽気だっちゃ",
-                    ],
-                    "cool": [
-                        "ひんやり晴れだな、羽織一枚あるといいべ",
-                        "日差しあっても体感は低めだべ、服で調整しよ",
-                        "朝晩さむいかも、油断すんなよ",
-                    ],
-                    "cold": [
-                        "快晴でも冷えるっちゃ、手袋やマフラー用意だべ",
-                        "空気つめてぇ、重ね着してあったまろう",
-                        "放射冷却で冷え込みやすいから気をつけてな",
-                    ],
-                },
-                "cloudy": {
-                    "hot": [
-                        "曇ってても蒸すべ、こまめに水分な",
-                        "日差し弱めでも暑いっちゃ、無理すんなよ",
-                        "風通し良い服装がいいべ",
-                    ],
-                    "warm": [
-                        "雲多めで動きやすい日だな、今のうちに片付けよう",
-                        "熱こもりにくくて楽だべ、外回りもしやすい",
-                        "穏やかな曇りで、作業はかどるっちゃ",
-                    ],
-                    "cool": [
-                        "ひんやり曇り、羽織一枚あると助かるべ",
-                        "日差しないぶん体感低いな、首元あっためよ",
-                        "長居はほどほどだべな",
-                    ],
-                    "cold": [
-                        "曇りで底冷えするべ、防寒しっかりな",
-                        "温かい飲み物で体あっためていぐべ",
-                        "暗くなるといっそう寒いがら、早めに帰ろう",
-                    ],
-                },
-                "rain": {
-                    "hot": [
-                        "蒸し雨だべ、通気性いいレインが楽だな",
-                        "汗と雨で冷えやすいっちゃ、タオルと替えシャツ持ってくべ",
-                        "小雨の合間みて動くといいべ",
-                    ],
-                    "warm": [
-                        "雨でも気温高め、ムレ対策しとくと楽だべ",
-                        "荷物は撥水が安心だな、傘忘れんなよ",
-                        "出入りでムワッとするから、体調気をつけてな",
-                    ],
-                    "cool": [
-                        "ひんやり雨、傘は必須だべ",
-                        "濡れると冷えるがら、タオル一枚持ってくといい",
-                        "屋内の逃げ場つくっておくと安心だべ",
-                    ],
-                    "cold": [
-                        "冷たい雨だべ、手袋と防水の靴が役立つな",
-                        "体温奪われやすいっちゃ、無理しないでいこう",
-                        "風ある日は合羽があると違うべ",
-                    ],
-                },
-                "snow": {
-                    "hot": [
-                        "めずらしい雪の条件だべ、足元最優先でな",
-                        "気温高めでも雪は要注意だっちゃ",
-                        "状況変わりやすいから慎重にいぐべ",
-                    ],
-                    "warm": [
-                        "みぞれ気味で足元わるい、はねに気をつけてな",
-                        "解けかけで滑りやすいっちゃ、歩幅ちいさめに",
-                        "濡れ冷えしやすいから体温管理しっかりな",
-                    ],
-                    "cool": [
-                        "小雪でひんやり、足元注意だべ",
-                        "視界白っぽいから横断は慎重にいこう",
-                        "靴が濡れると冷えるっちゃ、替え靴下あると安心だべ",
-                    ],
-                    "cold": [
-                        "凍結こわいべ、時間に余裕持って動こう",
-                        "転倒注意だっちゃ、滑りにくい靴でな",
-                        "日没後は危険度上がるから寄り道控えめに",
-                    ],
-                },
-            },
-
-            "chugoku": {
-                "sunny": {
-                    "hot": [
-                        "よう暑いで、こまめに水分と日陰で休みんさい",
-                        "日差しがきついけぇ、帽子と日焼け対策しんさい",
-                        "無理はせんほうがええ、涼しいとこ使いんさい",
-                    ],
-                    "warm": [
-                        "ええ晴れじゃ、用事はさくさく進むで",
-                        "過ごしやすい陽気じゃけぇ、洗濯日和じゃの",
-                        "動くなら今がちょうどええ時間よ",
-                    ],
-                    "cool": [
-                        "ひんやり晴れじゃ、羽織が一枚あると安心よ",
-                        "日差しあっても体感は低いけぇ、服で調整しんさい",
-                        "朝晩は冷えるけぇ、油断せんようにな",
-                    ],
-                    "cold": [
-                        "快晴でも冷えるで、手袋やマフラー持っときんさい",
-                        "空気がつめたいけぇ、重ね着で温もろうや",
-                        "放射冷却で冷え込みやすいけぇ気ぃつけんさい",
-                    ],
-                },
-                "cloudy": {
-                    "hot": [
-                        "曇っとっても蒸し暑いで、こまめに水分な",
-                        "日差し弱うても暑いけぇ、無理せんように",
-                        "風通しのええ服装で行きんさい",
-                    ],
-                    "warm": [
-                        "雲多めで動きやすいわ、今のうちに片付けんさい",
-                        "熱こもりにくうて楽じゃわ、外回りもしやすいで",
-                        "穏やかな曇りで作業はかどるのう",
-                    ],
-                    "cool": [
-                        "ひんやり曇りじゃ、羽織一枚あると助かるで",
-                        "日差しないぶん体感低いけぇ、首元温めんさい",
-                        "長居はほどほどがええで",
-                    ],
-                    "cold": [
-                        "曇りで底冷えするわ、防寒しっかりしんさい",
-                        "温かい飲みもんで体を温めんさい",
-                        "暗うなると一段と寒いけぇ、早めに帰りんさい",
-                    ],
-                },
-                "rain": {
-                    "hot": [
-                        "蒸し雨じゃ、通気性ええレインが楽よ",
-                        "汗と雨で冷えやすいけぇ、タオルと替えシャツあると安心じゃ",
-                        "小雨の合間を上手に使いんさい",
-                    ],
-                    "warm": [
-                        "雨でも気温は高めじゃ、ムレ対策しんさい",
-                        "荷物は撥水が安心よ、傘も忘れんさんな",
-                        "出入りでムワッとするけぇ、体調に気ぃつけんさい",
-                    ],
-                    "cool": [
-                        "ひんやり雨じゃ、傘は必須よ",
-                        "濡れると冷えるけぇ、タオル一枚持っとくとええ",
-                        "屋内の逃げ場つくっとくと安心じゃ",
-                    ],
-                    "cold": [
-                        "冷たい雨じゃ、手袋と防水靴が役立つで",
-                        "体温もっていかれやすいけぇ、無理せんのがええ",
-                        "風ある日は合羽があると違うけぇの",
-                    ],
-                },
-                "snow": {
-                    "hot": [
-                        "珍しい雪の条件じゃ、足元最優先で行きんさい",
-                        "気温高めでも雪は要注意よ",
-                        "状況変わりやすいけぇ、慎重にな",
-                    ],
-                    "warm": [
-                        "みぞれ気味で足元悪いけぇ、水はね注意しんさい",
-                        "解けかけで滑りやすいけぇ、歩幅は小さめにな",
-                        "濡れ冷えしやすいけぇ、体温管理しんさい",
-                    ],
-                    "cool": [
-                        "小雪まじりでひんやりじゃ、足元気ぃつけんさい",
-                        "視界白うなるけぇ、横断は慎重にの",
-                        "靴が濡れると冷えるけぇ、替え靴下あると安心よ",
-                    ],
-                    "cold": [
-                        "凍結が怖いけぇ、時間に余裕持って動きんさい",
-                        "転倒注意じゃ、滑りにくい靴と手袋でな",
-                        "日没後は危険度上がるけぇ、寄り道控えめがええ",
-                    ],
-                },
-            },
-
-            "kyushu": {
-                "sunny": {
-                    "hot": [
-                        "めっちゃ暑かね、水分と日陰休憩ば忘れんごとね",
-                        "日差し強かけん、帽子と日焼け対策もしとったがよかよ",
-                        "無理せんで、涼しか所うまく使うとよかばい",
-                    ],
-                    "warm": [
-                        "気持ちよか晴れたい、用事がはかどるね",
-                        "過ごしやすか陽気やけん、洗濯日和たい",
-                        "動くなら今がちょうどよかね",
-                    ],
-                    "cool": [
-                        "ひんやり晴れやけん、羽織一枚あると安心たい",
-                        "日差しあっても体感は低めやけん、服で調整しよ",
-                        "朝晩は冷えるけん、油断せんごと",
-                    ],
-                    "cold": [
-                        "快晴でも冷えるばい、手袋やマフラーが役立つたい",
-                        "空気がつめたか、重ね着して温もろうね",
-                        "放射冷却で冷え込みやすかけん、気をつけんね",
-                    ],
-                },
-                "cloudy": {
-                    "hot": [
-                        "曇っとっても蒸し暑か、こまめに水分ばい",
-                        "日差し弱うても暑かけん、無理は禁物たい",
-                        "風通しのよか服装でいこ",
-                    ],
-                    "warm": [
-                        "雲多めで動きやすか、今のうちに片付けよ",
-                        "熱こもりにくくて楽たい、外回りもしやすかね",
-                        "穏やかな曇りで作業はかどるばい",
-                    ],
-                    "cool": [
-                        "ひんやり曇りやけん、羽織一枚あるとよかよ",
-                        "日差しないぶん体感低か、首元温めると楽たい",
-                        "長居はほどほどにしとこ",
-                    ],
-                    "cold": [
-                        "曇りで底冷えするばい、防寒しっかりね",
-                        "温かい飲み物で体ば温めていこう",
-                        "暗うなると一段と寒かけん、早めに帰ろ",
-                    ],
-                },
-                "rain": {
-                    "hot": [
-                        "蒸し雨たい、通気性のよかレインが楽ばい",
-                        "汗と雨で冷えやすかけん、タオルと替えシャツあると安心たい",
-                        "小雨の合間ば上手に使おうね",
-                    ],
-                    "warm": [
-                        "雨でも気温は高めたい、ムレ対策しとくとよかよ",
-                        "荷物は撥水が安心やけん、傘も忘れんごと",
-                        "出入りでムワッとするけん、体調に気をつけてね",
-                    ],
-                    "cool": [
-                        "ひんやり雨やけん、傘は必須たい",
-                        "濡れると冷えるけん、タオル一枚あると助かるばい",
-                        "屋内の逃げ場つくっとくと安心たい",
-                    ],
-                    "cold": [
-                        "冷たい雨ばい、手袋と防水靴が役立つよ",
-                        "体温持っていかれやすかけん、無理せんごと",
-                        "風ある日は合羽があると違うたい",
-                    ],
-                },
-                "snow": {
-                    "hot": [
-                        "珍しか雪の条件やけん、足元最優先たい",
-                        "気温高めでも雪は要注意ばい",
-                        "状況変わりやすかけん、慎重に動こ",
-                    ],
-                    "warm": [
-                        "みぞれ気味で足元わるかね、水はね注意たい",
-                        "解けかけで滑りやすかけん、歩幅は小さめで",
-                        "濡れ冷えしやすかけん、体温管理しとこう",
-                    ],
-                    "cool": [
-                        "小雪でひんやりたい、足元気をつけんね",
-                        "視界が白っぽかけん、横断は慎重に",
-                        "靴が濡れると冷えるたい、替え靴下あると安心ばい",
-                    ],
-                    "cold": [
-                        "凍結が怖か、時間に余裕持って動こうね",
-                        "転倒注意やけん、滑りにくい靴と手袋で",
-                        "日没後は危険度上がるけん、寄り道控えめがよか",
-                    ],
-                },
-            },
-        }
-
-    def _build_tails(self):
-        return {
-            "kanto": {
-                "morning": [
-                    "朝のうちに動けることを進めよう",
-                    "通勤前に準備を整えておこう",
-                    "朝は無理せず体を慣らしていこう",
-                ],
-                "day": [
-                    "日中はこまめに休憩ね",
-                    "外の用事は今のうちに片付けよう",
-                    "昼は水分と小休止を意識して",
-                ],
-                "evening": [
-                    "夕方は早めに切り上げると安心だよ",
-                    "日没前に移動を終えよう",
-                    "夕方は混みやすいから余裕を持ってね",
-                ],
-                "night": [
-                    "夜は見通しが悪いから安全第一で",
-                    "帰り道は足元と車に注意してね",
-                    "夜は冷えやすいから早めに帰ろう",
-                ],
-            },
-            "kansai": {
-                "morning": [
-                    "朝のうちにササッと進めよか",
-                    "通勤前に準備だけ整えとこ",
-                    "朝は無理せんと体慣らしていこ",
-                ],
-                "day": [
-                    "日中はこまめに休憩な",
-                    "外の用事は今のうちに片付けよ",
-                    "昼は水分と小休止わすれんといて",
-                ],
-                "evening": [
-                    "夕方は早めに切り上げるんが安心やで",
-                    "日没前に移動は終わらせとこ",
-                    "夕方は混みがちやし、余裕持ってな",
-                ],
-                "night": [
-                    "夜は見通し悪いし安全第一でな",
-                    "帰り道は足元と車に気ぃつけてや",
-                    "夜は冷えやすいし、早めに帰ろか",
-                ],
-            },
-            "tohoku": {
-                "morning": [
-                    "朝のうちにできること進めっぺ",
-                    "通勤前に準備ととのえような",
-                    "朝は無理しねで体慣らしていこう",
-                ],
-                "day": [
-                    "日中はこまめに休憩すっぺ",
-                    "外の用事は今のうちに片付けよう",
-                    "昼は水分と小休止いれっぺ",
-                ],
-                "evening": [
-                    "夕方は早めに切り上げると安心だべ",
-                    "日没前に移動終わらせような",
-                    "夕方は混みがちだがら余裕持ってな",
-                ],
-                "night": [
-                    "夜は見通し悪いから安全第一だべ",
-                    "帰り道は足元と車さ注意してな",
-                    "夜は冷えやすいがら早めに帰ろう",
-                ],
-            },
-            "chugoku": {
-                "morning": [
-                    "朝のうちにできること進めんさい",
-                    "通勤前に準備を整えんさい",
-                    "朝は無理せんと体慣らしていこ",
-                ],
-                "day": [
-                    "日中はこまめに休憩しんさい",
-                    "外の用事は今のうちに片付けんさい",
-                    "昼は水分と小休止を意識しんさい",
-                ],
-                "evening": [
-                    "夕方は早めに切り上げるんが安心よ",
-                    "日没前に移動を終えんさい",
-                    "夕方は混みやすいけぇ余裕を持っての",
-                ],
-                "night": [
-                    "夜は見通し悪いけぇ安全第一で",
-                    "帰り道は足元と車に気ぃつけんさい",
-                    "夜は冷えやすいけぇ早めに帰りんさい",
-                ],
-            },
-            "kyushu": {
-                "morning": [
-                    "朝のうちにできること進めとこ",
-                    "通勤前に準備ば整えとこう",
-                    "朝は無理せんで体慣らしていこ",
-                ],
-                "day": [
-                    "日中はこまめに休憩しとこうね",
-                    "外の用事は今のうちに片付けよう",
-                    "昼は水分と小休止、忘れんごとね",
-                ],
-                "evening": [
-                    "夕方は早めに切り上げた方が安心たい",
-                    "日没前に移動は済ませとこう",
-                    "夕方は混みやすかけん、余裕持って動こ",
-                ],
-                "night": [
-                    "夜は見通し悪かけん安全第一たい",
-                    "帰り道は足元と車に気をつけんね",
-                    "夜は冷えやすかけん早めに帰ろ",
-                ],
-            },
-        }
+        return [{"morning":"朝はゆっくり準備しよう",
+                 "day":"日中はこまめに休憩ね",
+                 "evening":"夕方は早めに切り上げよう",
+                 "night":"夜は安全第一でね"}.get(timeband, "")]
 
 # ---------- 表示 ----------
+# 時間数（/weather hours / 「@Bot 大阪 12h」）
+DEFAULT_HOURS = 3
+MAX_HOURS = 48
+EMBED_COMPACT_AFTER = 6       # これを超えたら 1 行を短くしてスパークラインを付ける
+EMBED_DESCRIPTION_LIMIT = 4096
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values: list[float]) -> str:
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1.0
+    top = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[round((v - lo) / span * top)] for v in values)
+
 def build_embed(place: dict, rows: list[dict]) -> discord.Embed:
     loc = place['name']; admin = place.get('admin1') or ''; country = place.get('country') or ''
     title = f"{loc}（{admin + '・' if admin else ''}{country}）".strip("（）")
-    embed = discord.Embed(title=f"直近3時間の天気 | {title}", color=0x4C7CF3)
+    embed = discord.Embed(title=f"直近{len(rows)}時間の天気 | {title}", color=0x4C7CF3)
     lines=[]
-    for r in rows:
-        t=r['time']; emoji=pick_emoji(r['weathercode'])
-        wind = r.get("wind", 0.0)
-        lines.append(
-            f"**{t.strftime('%H:%M')}** {emoji}  気温 **{r['temp']:.1f}°C**  "
-            f"降水確率 **{r['pop']}%**  降水量 **{r['precip']:.1f}mm**  風速 **{wind:.1f}m/s**"
-        )
-    embed.description="\n".join(lines)
+    if len(rows) <= EMBED_COMPACT_AFTER:
+        for r in rows:
+            t=r['time']; emoji=pick_emoji(r['weathercode'])
+            wind = r.get("wind", 0.0)
+            lines.append(
+                f"**{t.strftime('%H:%M')}** {emoji}  気温 **{r['temp']:.1f}°C**  "
+                f"降水確率 **{r['pop']}%**  降水量 **{r['precip']:.1f}mm**  風速 **{wind:.1f}m/s**"
+            )
+    else:
+        # 長い時間幅はコンパクト表示（Embed の文字数上限対策）。日付が変わる行だけ日付を付ける
+        temps = [r['temp'] for r in rows]
+        lines.append(f"気温 `{sparkline(temps)}` {min(temps):.0f}〜{max(temps):.0f}°C")
+        lines.append(f"降水 `{sparkline([r['pop'] for r in rows])}` 最大{max(r['pop'] for r in rows)}%")
+        prev_day = None
+        for r in rows:
+            t = r['time']
+            stamp = t.strftime('%H') if t.date() == prev_day else t.strftime('%m/%d %H')
+            prev_day = t.date()
+            lines.append(
+                f"`{stamp}時` {pick_emoji(r['weathercode'])} {r['temp']:.0f}° {r['pop']}% {r['precip']:.1f}mm"
+            )
+    desc = "\n".join(lines)
+    if len(desc) > EMBED_DESCRIPTION_LIMIT:
+        desc = desc[:EMBED_DESCRIPTION_LIMIT - 1] + "…"
+    embed.description=desc
+    ts=datetime.now(JST).strftime('%Y-%m-%d %H:%M')
+    embed.set_footer(text=f"更新: {ts} JST • Powered by Open-Meteo")
+    return embed
+
+def build_batch_embed(results: list, hours: int) -> discord.Embed:
+    # 複数地点は 1 地点 1 フィールドのコンパクト表示
+    embed = discord.Embed(title=f"{len(results)}地点の天気 | 直近{hours}時間", color=0x4C7CF3)
+    for query, place, rows, err in results:
+        if err:
+            embed.add_field(name=query, value=f"⚠️ {err}", inline=False)
+            continue
+        admin = place.get('admin1') or ''
+        name = f"{place['name']}（{admin}）" if admin else place['name']
+        lines = [
+            f"`{r['time'].strftime('%H')}時` {pick_emoji(r['weathercode'])} {r['temp']:.0f}° {r['pop']}%"
+            for r in rows
+        ]
+        embed.add_field(name=name[:256], value="\n".join(lines)[:1024], inline=True)
     ts=datetime.now(JST).strftime('%Y-%m-%d %H:%M')
     embed.set_footer(text=f"更新: {ts} JST • Powered by Open-Meteo")
     return embed
 
+# ---------- Hourly slicing ----------
+# Open-Meteo の hourly は等間隔なので、先頭時刻と now から開始位置を直接計算する
+# （全要素を fromisoformat するループをやめる）。等間隔でなければ epoch 配列を二分探索
+HOURLY_COLUMNS = (
+    # (行のキー, hourly のキー, 型, 欠損時の値)
+    ("temp", "temperature_2m", float, 0.0),
+    ("pop", "precipitation_probability", int, 0),
+    ("precip", "precipitation", float, 0.0),
+    ("weathercode", "weathercode", int, 0),
+    ("wind", "windspeed_10m", float, 0.0),
+)
+
+def parse_hourly_time(ts: str, tzinfo) -> datetime:
+    t = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    return t if t.tzinfo else t.replace(tzinfo=tzinfo)
+
+def _column(values, start: int, stop: int, cast, default) -> list:
+    part = list((values or [])[start:stop])
+    part += [None] * (stop - start - len(part))
+    return [default if v is None else cast(v) for v in part]
+
+def slice_hourly(data: dict, now: datetime, n: int) -> list[dict]:
+    hourly = data.get("hourly") or {}
+    times = hourly.get("time") or []
+    if not times:
+        return []
+    # 返却時刻は timezone 指定のローカル時刻（オフセット無し）なので utc_offset_seconds を付ける
+    offset = data.get("utc_offset_seconds")
+    tzinfo = timezone(timedelta(seconds=offset)) if offset is not None else JST
+    try:
+        t0 = parse_hourly_time(times[0], tzinfo)
+        step = (parse_hourly_time(times[1], tzinfo) - t0) if len(times) > 1 else timedelta(hours=1)
+        last = parse_hourly_time(times[-1], tzinfo)
+    except ValueError:
+        return []
+
+    if step > timedelta(0) and last == t0 + step * (len(times) - 1):
+        start = max(0, -(-(now - t0) // step))  # ceil((now - t0) / step)
+        stop = min(start + n, len(times))
+        stamps = [(t0 + step * i).astimezone(JST) for i in range(start, stop)]
+    else:
+        epochs = []
+        for ts in times:
+            try:
+                epochs.append(parse_hourly_time(ts, tzinfo).timestamp())
+            except ValueError:
+                epochs.append(float("-inf"))  # 壊れた行は「過去」として読み飛ばす
+        start = bisect.bisect_left(epochs, now.timestamp())
+        stop = min(start + n, len(times))
+        stamps = [datetime.fromtimestamp(e, JST) for e in epochs[start:stop]]
+    if start >= stop:
+        return []
+
+    cols = [_column(hourly.get(src), start, stop, cast, default)
+            for _, src, cast, default in HOURLY_COLUMNS]
+    keys = ["time"] + [key for key, *_ in HOURLY_COLUMNS]
+    return [dict(zip(keys, vals)) for vals in zip(stamps, *cols)]
+
 # ---------- Core ----------
-async def get_next_3_hours(session: aiohttp.ClientSession, place_query: str):
-    geo = await geocode(session, place_query)
+BUSY_MESSAGE = "いま問い合わせが混み合ってるみたい…少し待ってからもう一回試してね"
+
+async def get_next_hours(session: aiohttp.ClientSession, place_query: str, hours: int = DEFAULT_HOURS):
+    hours = max(1, min(MAX_HOURS, hours))
+    try:
+        with metrics.timer("geocode"):
+            geo = await geocode(session, place_query)
+    except UpstreamBusy:
+        return None, None, BUSY_MESSAGE
     if not geo:
         return None, None, "場所が見つかりませんでした。別の表記でもう一度試してね。"
-    data = await fetch_forecast(session, geo["latitude"], geo["longitude"], geo["timezone"])
+    try:
+        with metrics.timer("forecast"):
+            data = await fetch_forecast(session, geo["latitude"], geo["longitude"], geo["timezone"], hours=hours)
+    except UpstreamBusy:
+        return geo, None, BUSY_MESSAGE
     if not data or "hourly" not in data:
         return geo, None, "天気データの取得に失敗しました。時間をおいて再度お試しください。"
 
-    times = data["hourly"]["time"]
-    temps = data["hourly"]["temperature_2m"]
-    pops  = data["hourly"].get("precipitation_probability", [0]*len(times))
-    precs = data["hourly"].get("precipitation", [0.0]*len(times))
-    codes = data["hourly"].get("weathercode", [0]*len(times))
-    winds = data["hourly"].get("windspeed_10m", [0.0]*len(times))
-
-    now = datetime.now(JST)
-    rows=[]
-    for i, ts in enumerate(times):
-        try:
-            t = datetime.fromisoformat(ts.replace("Z", "+00:00")).astimezone(JST)
-        except Exception:
-            continue
-        if t >= now and len(rows) < 3:
-            rows.append({
-                "time": t,
-                "temp": float(temps[i]),
-                "pop": int(pops[i]) if i < len(pops) and pops[i] is not None else 0,
-                "precip": float(precs[i]) if i < len(precs) and precs[i] is not None else 0.0,
-                "weathercode": int(codes[i]) if i < len(codes) and codes[i] is not None else 0,
-                "wind": float(winds[i]) if i < len(winds) and winds[i] is not None else 0.0,
-            })
-        if len(rows) == 3:
-            break
+    with metrics.timer("parse"):
+        rows = slice_hourly(data, datetime.now(JST), hours)
     if not rows:
-        return geo, None, "直近3時間のデータが見つかりませんでした。"
+        return geo, None, f"直近{hours}時間のデータが見つかりませんでした。"
     return geo, rows, None
 
+async def get_next_3_hours(session: aiohttp.ClientSession, place_query: str):
+    return await get_next_hours(session, place_query, 3)
+
+async def get_batch_hours(session: aiohttp.ClientSession, queries: list[str], hours: int = DEFAULT_HOURS):
+    """複数地点：ジオコーディングは並列、予報は fetch_forecast_batch でまとめて 1 リクエスト"""
+    hours = max(1, min(BATCH_MAX_HOURS, hours))
+    with metrics.timer("geocode"):
+        geos = await asyncio.gather(*(geocode(session, q) for q in queries), return_exceptions=True)
+    found = [(i, g) for i, g in enumerate(geos) if isinstance(g, dict)]
+    with metrics.timer("forecast"):
+        datas = await fetch_forecast_batch(session, [g for _, g in found], hours)
+    results = [
+        (q, None, None, "混み合っています" if isinstance(g, UpstreamBusy) else "場所が見つかりませんでした")
+        for q, g in zip(queries, geos)
+    ]
+    for i, g in found:
+        results[i] = (queries[i], g, None, "天気データの取得に失敗しました")
+    now = datetime.now(JST)
+    with metrics.timer("parse"):
+        for (i, g), data in zip(found, datas):
+            rows = slice_hourly(data, now, hours) if data else []
+            if rows:
+                results[i] = (queries[i], g, rows, None)
+    return results
+
 # ---------- Message handling ----------
 MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
 
 def extract_query_from_message(content: str, bot_id: int) -> str | None:
+    if "<@" not in content:  # メンションが無ければ正規表現は走らせない
+        return None
     m = MENTION_PATTERN.search(content)
     if not m: return None
     if int(m.group(1)) != bot_id: return None
-    rest = MENTION_PATTERN.sub("", content, count=1).strip()
+    rest = (content[:m.start()] + content[m.end():]).strip()  # 最初のメンションだけ外す（sub をもう 1 回しない）
     return rest or None
 
+def message_query(message: discord.Message, bot_user) -> str | None:
+    # MESSAGE CONTENT で全ギルドの全発言が来る。Bot 宛てでないものは、ゲートウェイがもう解析済みの
+    # mentions だけ見て弾く（ほとんどは空リストなので即終わる）
+    if message.author.bot or bot_user not in message.mentions:
+        return None
+    return extract_query_from_message(message.content, bot_user.id)
+
+BATCH_MAX = int(os.getenv("BATCH_MAX", "5"))  # 1 メッセージで聞ける地点数
+BATCH_MAX_HOURS = 12                           # 複数地点は Embed のフィールド上限(1024字)に収まる範囲まで
+PLACE_SEPARATORS = re.compile(r"[\s、,，/／]+")    # /weather_multi（複数地点と明示されている）
+EXPLICIT_SEPARATORS = re.compile(r"[、,，/／]+")
+SPACE_SEPARATORS = re.compile(r"\s+")
+SAME_AREA_DEG = 0.1                            # 緯度経度ともこれ未満の差なら同じ場所の言い換え（約 10km）
+
+def index_separates(words: list[str]) -> bool:
+    # どの語も地名辞書にあって、互いに SAME_AREA_DEG 以上離れているか。
+    # 近い組（「大阪市 梅田」）は「市 + その中の場所」の絞り込みとみなして分けない
+    hits = [place_index.lookup(w) for w in words]
+    if any(h is None for h in hits):
+        return False
+    return all(abs(a["latitude"] - b["latitude"]) >= SAME_AREA_DEG
+               or abs(a["longitude"] - b["longitude"]) >= SAME_AREA_DEG
+               for a, b in itertools.combinations(hits, 2))
+
+async def resolves_as_one(session: aiohttp.ClientSession, name: str) -> bool:
+    if place_index.lookup(name) is not None:
+        return True
+    try:
+        return await geocode(session, name) is not None  # 結果はキャッシュに残るので本番の問い合わせで再利用される
+    except UpstreamBusy:
+        return True  # 混雑中は分けて問い合わせを増やさない
+
+async def split_places(session: aiohttp.ClientSession, query: str) -> list[str]:
+    # 「大阪、京都」→ いつでも複数地点。「大阪 京都 神戸」のような空白区切りは、どの語も地名辞書に
+    # あれば分ける。辞書にない語を含むときだけ、まとめて 1 地点として引けるか上流に聞き、引けなければ分ける
+    # （「New York」「大阪市 梅田」を 2 地点にしない。上流は 3 文字以上をあいまい一致するので辞書を先に見る）
+    parts = []
+    for seg in filter(None, (p.strip() for p in EXPLICIT_SEPARATORS.split(query))):
+        words = SPACE_SEPARATORS.split(seg)
+        if len(words) > 1 and place_index.lookup(seg) is None and index_separates(words):
+            parts.extend(words)  # どの語も辞書にある別々の場所 → 問い合わせなしで分ける
+        elif len(words) > 1 and not await resolves_as_one(session, seg):
+            parts.extend(words)
+        else:
+            parts.append(seg)
+    seen, uniq = set(), []
+    for p in parts:
+        k = normalize_query(p)
+        if k not in seen:
+            uniq.append(p); seen.add(k)
+    return uniq[:BATCH_MAX] or [query]
+
+HOURS_SUFFIX = re.compile(r"\s+(\d{1,2})\s*(?:h|H|ｈ|時間)$")
+
+def split_hours(query: str) -> tuple[str, int]:
+    # 「大阪 12h」「大阪 12時間」→ ("大阪", 12)。指定なしは既定の 3 時間
+    m = HOURS_SUFFIX.search(query)
+    if not m:
+        return query, DEFAULT_HOURS
+    place = query[:m.start()].strip()
+    if not place:
+        return query, DEFAULT_HOURS
+    return place, max(1, min(MAX_HOURS, int(m.group(1))))
+
 engine = CommentEngine()
 
-def build_comment(rows: list[dict], place: dict) -> str:
+# 1 にすると (地点, 予報の先頭時刻, 方言) から種を作ってコメントを選ぶ。同じ時間帯の同じ問い合わせには
+# 一字一句同じ返事になる（描画結果をキャッシュ・スナップショットできる）が、1 時間たてば文は変わる
+COMMENT_SEEDED = os.getenv("COMMENT_SEEDED", "0") == "1"
+
+def comment_seed(place: dict, rows: list[dict], dialect: str) -> str:
+    hour = rows[0]["time"].strftime("%Y-%m-%dT%H") if rows else ""
+    return f"{place.get('name')}|{place.get('latitude')},{place.get('longitude')}|{hour}|{dialect}"
+
+def build_comment(rows: list[dict], place: dict, seeded: bool | None = None) -> str:
     weather_key = categorize_weather(rows)    # sunny/cloudy/rain/snow
     temp_key    = categorize_temp(rows)       # hot/warm/cool/cold
     time_key    = categorize_time(rows)       # morning/day/evening/night
-    dialect     = pick_dialect_key(place)     # kanto/kansai/tohoku/chugoku/kyushu
+    dialect     = pick_dialect_key(place)     # kanto/kansai/...（data/comments/index.json）
     has_thunder = any(r["weathercode"] in (95,96,99) for r in rows)
-    return engine.get(dialect, weather_key, temp_key, time_key, has_thunder)
+    # str の種は sha512 で整数化されるので、プロセスをまたいでも同じ乱数列になる
+    seeded = COMMENT_SEEDED if seeded is None else seeded
+    rng = random.Random(comment_seed(place, rows, dialect)) if seeded else None
+    return engine.get(dialect, weather_key, temp_key, time_key, has_thunder, rng)
+
+# 描画済みの返事（コメント, Embed）。地点・予報の先頭時刻・時間幅・方言が同じなら、その時間中は
+# Embed もコメントも作り直さず dict を 1 回引くだけで返す。先頭時刻がキーに入っているので、
+# 時刻が次の時間に進めば自然に別キーになる（TTL も次の正時まで）
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "1024"))
+render_cache = TTLCache(RENDER_CACHE_SIZE, 3600)
+
+def render_key(place: dict, rows: list[dict]) -> tuple:
+    # 予報の通し番号も入れる：裏で取り直したら（stale-while-revalidate）同じ時間内でも描き直す
+    version = forecast_versions.peek_stale(grid_key(place["latitude"], place["longitude"], place.get("timezone")))
+    return (place.get("name"), place.get("latitude"), place.get("longitude"),
+            rows[0]["time"], len(rows), pick_dialect_key(place), version)
+
+def render_reply(place: dict, rows: list[dict]) -> tuple[str, discord.Embed]:
+    key = render_key(place, rows)
+    hit = render_cache.get(key)
+    if hit is not TTLCache.MISS:
+        return hit
+    with metrics.timer("embed"):
+        embed = build_embed(place, rows)
+    try:
+        with metrics.timer("comment"):
+            comment = build_comment(rows, place)
+    except Exception as e:
+        print(f"[WARN] comment build failed: {e}")
+        return ensure_aa("今日は無理せず、安全第一でいこう"), embed  # 失敗時の返事は覚えない
+    # Embed は送信で書き換わらないので、そのまま共有する（recent_answers と同じ）
+    render_cache.set(key, (comment, embed), ttl=seconds_until_next_hour())
+    return comment, embed
+
+def render_batch_reply(results: list, hours: int) -> tuple[str, discord.Embed]:
+    with metrics.timer("embed"):
+        embed = build_batch_embed(results, hours)
+    ok = [(g, rows) for _, g, rows, err in results if not err]
+    try:
+        with metrics.timer("comment"):
+            # コメントは最初に取れた地点の方言で、全地点の行をまとめて分類する
+            comment = build_comment([r for _, rows in ok for r in rows], ok[0][0]) if ok else ensure_aa(
+                "どこも見つからんかった…表記を変えてもう一回試してね")
+    except Exception as e:
+        print(f"[WARN] comment build failed: {e}")
+        comment = ensure_aa("今日は無理せず、安全第一でいこう")
+    return comment, embed
+
+# ---------- Throttle ----------
+# ユーザー/チャンネル単位の連投制限。dict を 2 世代（今の窓/1 つ前の窓）だけ持って窓ごとに入れ替えるので、
+# 古いキーは勝手に消えて無制限に育たない
+USER_LIMIT = int(os.getenv("USER_LIMIT", "4"))          # 1 ユーザーが窓内に投げられる数
+CHANNEL_LIMIT = int(os.getenv("CHANNEL_LIMIT", "12"))   # 1 チャンネルあたり
+THROTTLE_WINDOW = float(os.getenv("THROTTLE_WINDOW", "30"))
+
+class RollingBuckets:
+    def __init__(self, window: float):
+        self.window = window
+        self._epoch = int(time.monotonic() // window)
+        self._cur: dict = {}
+        self._prev: dict = {}
+
+    def _rotate(self) -> float:
+        now = time.monotonic()
+        epoch = int(now // self.window)
+        if epoch != self._epoch:
+            self._prev = self._cur if epoch == self._epoch + 1 else {}
+            self._cur = {}
+            self._epoch = epoch
+        return (now % self.window) / self.window  # 今の窓の経過割合
+
+    def incr(self, key) -> float:
+        """1 つ数えて、直近 1 窓ぶんの件数（前の窓は経過割合で按分した近似）を返す"""
+        frac = self._rotate()
+        n = self._cur.get(key, 0) + 1
+        self._cur[key] = n
+        return n + self._prev.get(key, 0) * (1 - frac)
+
+    def rate(self, key) -> float:
+        """直近 1 窓ぶんの件数（incr と同じ按分の近似）。数えはしない"""
+        frac = self._rotate()
+        return self._cur.get(key, 0) + self._prev.get(key, 0) * (1 - frac)
+
+    def get(self, key, default=None):
+        self._rotate()
+        if key in self._cur:
+            return self._cur[key]
+        return self._prev.get(key, default)
+
+    def set(self, key, value):
+        self._rotate()
+        self._cur[key] = value
+
+    def __len__(self):
+        return len(self._cur) + len(self._prev)
+
+user_buckets = RollingBuckets(THROTTLE_WINDOW)
+channel_buckets = RollingBuckets(THROTTLE_WINDOW)
+throttle_notified = RollingBuckets(THROTTLE_WINDOW)
+recent_answers = RollingBuckets(THROTTLE_WINDOW)  # (channel, query, hours) -> (content, embed)
+
+def throttled(user_id: int, channel_id: int) -> bool:
+    over_user = user_buckets.incr(user_id) > USER_LIMIT
+    over_channel = channel_buckets.incr(channel_id) > CHANNEL_LIMIT
+    if over_user or over_channel:
+        metrics.incr("throttled.user" if over_user else "throttled.channel")
+        return True
+    return False
+
+THROTTLE_MESSAGE = "ちょっと連投が多いかも…少し間をあけてからもう一回どうぞ"
+
+# ---------- Shards ----------
+# シャードごとの受信メッセージ数（直近 1 分）と接続イベント。ギルドは必ず同じシャードに来るので、
+# 連投制限や直前の答えはプロセスごとに持っていても食い違わない
+shard_events = RollingBuckets(60)
+
+def shard_latencies() -> list[tuple[int, float]]:
+    if isinstance(client, discord.AutoShardedClient):
+        return sorted(client.latencies)
+    return [(0, client.latency)]
+
+@client.event
+async def on_shard_connect(shard_id: int):
+    metrics.incr(f"shard.{shard_id}.connect")
+
+@client.event
+async def on_shard_disconnect(shard_id: int):
+    metrics.incr(f"shard.{shard_id}.disconnect")
+
+@client.event
+async def on_shard_resumed(shard_id: int):
+    metrics.incr(f"shard.{shard_id}.resumed")
 
 @client.event
 async def on_ready():
@@ -906,41 +1889,364 @@ async def on_ready():
 
 @client.event
 async def on_message(message: discord.Message):
-    if message.author.bot:
-        return
-    query = extract_query_from_message(message.content, client.user.id)
+    shard_events.incr(message.guild.shard_id if message.guild else 0)
+    query = message_query(message, client.user)
     if not query:
         return
+    query, hours = split_hours(query)
+    answer_key = (message.channel.id, normalize_query(query), hours)
+    if throttled(message.author.id, message.channel.id):
+        # 同じ質問なら直前の答えを返す（上流も typing も叩かない）。違う質問は窓ごとに 1 回だけ断る
+        last = recent_answers.get(answer_key)
+        if last is not None:
+            await message.reply(content=last[0], embed=last[1], mention_author=False)
+        elif throttle_notified.get(message.author.id) is None:
+            throttle_notified.set(message.author.id, True)
+            await message.reply(ensure_aa(THROTTLE_MESSAGE), mention_author=False)
+        return
     async with message.channel.typing():
-        async with aiohttp.ClientSession() as session:
-            place, rows, err = await get_next_3_hours(session, query)
+        places = await split_places(client.session, query)
+        if len(places) > 1:
+            results = await get_batch_hours(client.session, places, hours)
+            comment, embed = render_batch_reply(results, min(hours, BATCH_MAX_HOURS))
+        else:
+            place, rows, err = await get_next_hours(client.session, places[0], hours)
             if err:
                 await message.reply(ensure_aa(err), mention_author=False); return
-            embed = build_embed(place, rows)
-            try:
-                comment = build_comment(rows, place)
-            except Exception as e:
-                print(f"[WARN] comment build failed: {e}")
-                comment = ensure_aa("今日は無理せず、安全第一でいこう")
+            comment, embed = render_reply(place, rows)
+        recent_answers.set(answer_key, (comment, embed))
+        with metrics.timer("send"):
             await message.reply(content=comment, embed=embed, mention_author=False)
 
-@client.tree.command(name="weather", description="地名・ランドマーク名から直近3時間の天気を表示します")
-@app_commands.describe(location="地名/ランドマーク（例：大阪, USJ, 東京ディズニーランド）")
-async def weather(interaction: discord.Interaction, location: str):
+@client.tree.command(name="weather", description="地名・ランドマーク名から直近の天気を表示します（既定3時間）")
+@app_commands.describe(
+    location="地名/ランドマーク（例：大阪, USJ, 東京ディズニーランド）",
+    hours=f"何時間先まで表示するか（1〜{MAX_HOURS}、既定{DEFAULT_HOURS}）",
+)
+async def weather(interaction: discord.Interaction, location: str,
+                  hours: app_commands.Range[int, 1, MAX_HOURS] = DEFAULT_HOURS):
+    answer_key = (interaction.channel_id, normalize_query(location), hours)
+    if throttled(interaction.user.id, interaction.channel_id or 0):
+        last = recent_answers.get(answer_key)
+        if last is not None:
+            await interaction.response.send_message(content=last[0], embed=last[1])
+        else:
+            await interaction.response.send_message(ensure_aa(THROTTLE_MESSAGE), ephemeral=True)
+        return
     await interaction.response.defer(thinking=True)
-    async with aiohttp.ClientSession() as session:
-        place, rows, err = await get_next_3_hours(session, location)
-        if err:
-            await interaction.followup.send(ensure_aa(err), ephemeral=True); return
-        embed = build_embed(place, rows)
-        try:
-            comment = build_comment(rows, place)
-        except Exception as e:
-            print(f"[WARN] comment build failed: {e}")
-            comment = ensure_aa("今日は無理せず、安全第一でいこう")
+    place, rows, err = await get_next_hours(client.session, location, hours)
+    if err:
+        await interaction.followup.send(ensure_aa(err), ephemeral=True); return
+    comment, embed = render_reply(place, rows)
+    recent_answers.set(answer_key, (comment, embed))
+    with metrics.timer("send"):
         await interaction.followup.send(content=comment, embed=embed)
 
+@client.tree.command(name="weather_multi", description=f"複数地点（最大{BATCH_MAX}か所）の天気をまとめて表示します")
+@app_commands.describe(
+    locations="地名をスペースか「、」で区切って入力（例：大阪 京都 神戸）",
+    hours=f"何時間先まで表示するか（1〜{BATCH_MAX_HOURS}、既定{DEFAULT_HOURS}）",
+)
+async def weather_multi(interaction: discord.Interaction, locations: str,
+                        hours: app_commands.Range[int, 1, BATCH_MAX_HOURS] = DEFAULT_HOURS):
+    places = [p for p in PLACE_SEPARATORS.split(locations) if p][:BATCH_MAX]
+    if not places:
+        await interaction.response.send_message(ensure_aa("地名を入れてね"), ephemeral=True); return
+    if throttled(interaction.user.id, interaction.channel_id or 0):
+        await interaction.response.send_message(ensure_aa(THROTTLE_MESSAGE), ephemeral=True); return
+    await interaction.response.defer(thinking=True)
+    results = await get_batch_hours(client.session, places, hours)
+    comment, embed = render_batch_reply(results, hours)
+    with metrics.timer("send"):
+        await interaction.followup.send(content=comment, embed=embed)
+
+# ---------- Stats ----------
+def cache_stats() -> dict:
+    return {
+        "geocode": geocode_cache.stats(),
+        "forecast": forecast_cache.stats(),
+        "render": render_cache.stats(),
+        **({"shared": shared_forecasts.stats()} if shared_forecasts else {}),
+    }
+
+def flight_stats() -> dict:
+    return {"geocode": geocode_flight.stats(), "forecast": forecast_flight.stats()}
+
+def render_botstats() -> str:
+    lines = [f"version {BOT_VERSION} json={JSON_DECODER}", "", "stage        n      p50     p95     p99 (ms)"]
+    for stage, hist in sorted(metrics.stages.items()):
+        p = hist.percentiles()
+        lines.append(f"{stage:10s} {hist.count:5d} {p[0.5]*1e3:8.1f}{p[0.95]*1e3:8.1f}{p[0.99]*1e3:8.1f}")
+    lines.append("")
+    for name, st in cache_stats().items():
+        lines.append(f"cache.{name:9s} size={st['size']} hit={st['hit_ratio']:.1%} "
+                     f"({st['hits']}/{st['hits'] + st['misses']}) evict={st['evictions']}")
+    for name, st in flight_stats().items():
+        lines.append(f"flight.{name:8s} upstream={st['leaders']} coalesced={st['coalesced']}")
+    guilds: dict = {}
+    for g in client.guilds:
+        guilds[g.shard_id] = guilds.get(g.shard_id, 0) + 1
+    for sid, latency in shard_latencies():
+        lines.append(f"shard {sid:<3d} latency={latency*1e3:.0f}ms guilds={guilds.get(sid, 0)} "
+                     f"msgs/min={shard_events.rate(sid):.0f}")
+    lines.append(f"hot places tracked={len(hot_places)} refresh_top={HOT_REFRESH_TOP}")
+    for name, gov in upstream.governors.items():
+        q = metrics.stages.get(f"queue.{name}")
+        p95 = q.percentiles((0.95,))[0.95] if q else 0.0
+        lines.append(f"governor.{name:6s} waiting={gov.waiting} queue_p95={p95*1e3:.1f}ms "
+                     f"shed={metrics.counters.get(f'shed.{name}', 0)}")
+    for host, br in upstream.breakers.items():
+        lines.append(f"breaker {host} {br.state} failures={br.failures}")
+    if metrics.counters:
+        lines.append("")
+        lines.extend(f"{k} = {v}" for k, v in sorted(metrics.counters.items()))
+    return "\n".join(lines)
+
+def render_prometheus() -> str:
+    out = ["# TYPE weatherbot_stage_seconds summary"]
+    for stage, hist in sorted(metrics.stages.items()):
+        for q, v in hist.percentiles().items():
+            out.append(f'weatherbot_stage_seconds{{stage="{stage}",quantile="{q}"}} {v:.6f}')
+        out.append(f'weatherbot_stage_seconds_sum{{stage="{stage}"}} {hist.total:.6f}')
+        out.append(f'weatherbot_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+    out.append("# TYPE weatherbot_cache_hits_total counter")
+    for name, st in cache_stats().items():
+        out.append(f'weatherbot_cache_hits_total{{cache="{name}"}} {st["hits"]}')
+        out.append(f'weatherbot_cache_misses_total{{cache="{name}"}} {st["misses"]}')
+        out.append(f'weatherbot_cache_evictions_total{{cache="{name}"}} {st["evictions"]}')
+    out.append("# TYPE weatherbot_shard_latency_seconds gauge")
+    for sid, latency in shard_latencies():
+        out.append(f'weatherbot_shard_latency_seconds{{shard="{sid}"}} {latency:.6f}')
+        out.append(f'weatherbot_shard_messages_per_minute{{shard="{sid}"}} {shard_events.rate(sid):.1f}')
+    out.append("# TYPE weatherbot_events_total counter")
+    for name, v in sorted(metrics.counters.items()):
+        out.append(f'weatherbot_events_total{{name="{name}"}} {v}')
+    return "\n".join(out) + "\n"
+
+async def start_metrics_server(port: int) -> web.AppRunner:
+    async def handle(request: web.Request):
+        return web.Response(text=render_prometheus(), content_type="text/plain")
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    return runner
+
+@client.tree.command(name="botstats", description="Botの内部統計（オーナー専用）")
+async def botstats(interaction: discord.Interaction):
+    if not await client.is_owner(interaction.user):
+        await interaction.response.send_message("このコマンドはBotのオーナー専用やで。", ephemeral=True)
+        return
+    await interaction.response.send_message(f"```\n{render_botstats()[:1900]}\n```", ephemeral=True)
+
+# ---------- Subscriptions ----------
+# チャンネルごとの定時配信（例：毎朝 7:00 に大阪）。JSON ファイルに保存して再起動後も続ける
+SUBSCRIPTIONS_PATH = os.getenv("SUBSCRIPTIONS_PATH", "subscriptions.json")
+SUBSCRIPTION_JITTER = float(os.getenv("SUBSCRIPTION_JITTER", "20"))  # 送信を散らす最大秒数
+MAX_SUBSCRIPTIONS_PER_CHANNEL = 5
+SLOT_PATTERN = re.compile(r"^([01]?\d|2[0-3])[:：]([0-5]\d)$")
+
+@contextmanager
+def file_lock(path: str):
+    # 複数プロセスで同じファイルを読み書きするときの排他（横に .lock を置いて flock。fcntl が無ければ素通し）
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class SubscriptionStore:
+    def __init__(self, path: str, sharded: bool = False):
+        self.path = path
+        # シャードを複数プロセスに分けているときは、自分のギルドの分だけ持ち、保存時に他の分とマージする
+        self.sharded = sharded
+        self.items: list[dict] = []
+        self._lock = asyncio.Lock()
+
+    def _read(self) -> list[dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    async def load(self):
+        try:
+            items = await asyncio.to_thread(self._read)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] subscriptions not loaded ({self.path}): {e}")
+            items = []
+        self.items = [s for s in items if owns_guild(s.get("guild_id"))] if self.sharded else items
+
+    async def save(self):
+        mine = list(self.items)
+        def write():
+            # 読む→他プロセスの分とマージ→置き換え、の間に別プロセスが割り込むと追加が消えるのでロックする
+            with file_lock(self.path):
+                items = mine
+                if self.sharded:
+                    items = [s for s in self._read() if not owns_guild(s.get("guild_id"))] + mine
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(items, ensure_ascii=False, indent=1))
+                os.replace(tmp, self.path)  # 書きかけのファイルを残さない
+        async with self._lock:
+            await asyncio.to_thread(write)
+
+    def for_channel(self, channel_id: int) -> list[dict]:
+        return [s for s in self.items if s["channel_id"] == channel_id]
+
+    def due(self, slot: str) -> list[dict]:
+        return [s for s in self.items if s["time"] == slot]
+
+    async def add(self, sub: dict) -> bool:
+        same = (sub["channel_id"], normalize_query(sub["location"]), sub["time"])
+        if any((s["channel_id"], normalize_query(s["location"]), s["time"]) == same for s in self.items):
+            return False
+        self.items.append(sub)
+        await self.save()
+        return True
+
+    async def remove(self, channel_id: int, location: str | None = None) -> int:
+        key = normalize_query(location) if location else None
+        keep = [s for s in self.items
+                if not (s["channel_id"] == channel_id and (key is None or normalize_query(s["location"]) == key))]
+        removed = len(self.items) - len(keep)
+        if removed:
+            self.items = keep
+            await self.save()
+        return removed
+
+subscriptions = SubscriptionStore(SUBSCRIPTIONS_PATH, sharded=SHARD_IDS is not None)
+
+class SubscriptionScheduler:
+    """毎分起きて、その時刻の購読を場所ごとにまとめ、予報は格子ごとに 1 回だけ取って各チャンネルへ配る"""
+
+    def __init__(self, bot: "WeatherBot", store: SubscriptionStore):
+        self.bot = bot
+        self.store = store
+        self._task: asyncio.Task | None = None
+        self._last_slot: str | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            now = datetime.now(JST)
+            slot = now.strftime("%H:%M")
+            if slot != self._last_slot:
+                self._last_slot = slot
+                due = self.store.due(slot)
+                if due:
+                    # 送信の散らし（最大 SUBSCRIPTION_JITTER 秒）や上流待ちで次の分を見逃さないよう、裏で回す
+                    spawn_background(self.run_slot(due), f"scheduled slot {slot}")
+            now = datetime.now(JST)
+            await asyncio.sleep(60.5 - now.second - now.microsecond / 1e6)
+
+    async def run_slot(self, due: list[dict]):
+        session = self.bot.session
+        # 場所 → 購読の束。ジオコーディングは場所ごとに 1 回
+        by_place: dict = {}
+        for sub in due:
+            by_place.setdefault(normalize_query(sub["location"]), []).append(sub)
+        keys = list(by_place)
+        geos = await asyncio.gather(*(geocode(session, by_place[k][0]["location"]) for k in keys),
+                                    return_exceptions=True)
+        resolved = [(k, g) for k, g in zip(keys, geos) if isinstance(g, dict)]
+        hours = max(sub.get("hours", DEFAULT_HOURS) for sub in due)
+        # 同じ格子は fetch_forecast_batch の中で 1 回にまとまる
+        datas = await fetch_forecast_batch(session, [g for _, g in resolved], hours)
+        now = datetime.now(JST)
+        sends = []
+        for (k, geo), data in zip(resolved, datas):
+            for sub in by_place[k]:
+                rows = slice_hourly(data, now, sub.get("hours", DEFAULT_HOURS)) if data else []
+                if rows:
+                    sends.append(self._send_later(sub["channel_id"], *render_reply(geo, rows)))
+        metrics.incr("subscriptions.sent", len(sends))
+        await asyncio.gather(*sends)
+
+    async def _send_later(self, channel_id: int, content: str, embed: discord.Embed):
+        # 同じ時刻の配信が一斉に Discord へ飛ばないように散らす
+        await asyncio.sleep(random.uniform(0, SUBSCRIPTION_JITTER))
+        try:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            await channel.send(content=content, embed=embed)
+        except discord.HTTPException as e:
+            metrics.incr("subscriptions.failed")
+            print(f"[WARN] scheduled post to {channel_id} failed: {e}")
+
+@client.tree.command(name="subscribe", description="このチャンネルに毎日決まった時刻の天気を投稿します")
+@app_commands.describe(
+    location="地名/ランドマーク（例：大阪）",
+    time="投稿する時刻（JST, HH:MM 例：07:00）",
+    hours=f"何時間先まで（1〜{MAX_HOURS}、既定{DEFAULT_HOURS}）",
+)
+@app_commands.default_permissions(manage_channels=True)
+async def subscribe(interaction: discord.Interaction, location: str, time: str,
+                    hours: app_commands.Range[int, 1, MAX_HOURS] = DEFAULT_HOURS):
+    m = SLOT_PATTERN.match(time.strip())
+    if not m:
+        await interaction.response.send_message(ensure_aa("時刻は 07:00 みたいに HH:MM で入れてね"), ephemeral=True)
+        return
+    if len(subscriptions.for_channel(interaction.channel_id)) >= MAX_SUBSCRIPTIONS_PER_CHANNEL:
+        await interaction.response.send_message(
+            ensure_aa(f"1チャンネル{MAX_SUBSCRIPTIONS_PER_CHANNEL}件までやで"), ephemeral=True)
+        return
+    slot = f"{int(m.group(1)):02d}:{m.group(2)}"
+    added = await subscriptions.add({
+        "guild_id": interaction.guild_id, "channel_id": interaction.channel_id,
+        "location": location, "time": slot, "hours": hours, "created_by": interaction.user.id,
+    })
+    msg = f"毎日 {slot} に「{location}」の天気を投稿するね" if added else "その内容はもう登録済みやで"
+    await interaction.response.send_message(ensure_aa(msg), ephemeral=True)
+
+@client.tree.command(name="unsubscribe", description="このチャンネルの定時投稿を解除します")
+@app_commands.describe(location="解除する地名（省略でこのチャンネルの全件）")
+@app_commands.default_permissions(manage_channels=True)
+async def unsubscribe(interaction: discord.Interaction, location: str | None = None):
+    n = await subscriptions.remove(interaction.channel_id, location)
+    msg = f"{n}件解除したよ" if n else "解除するものが見つからんかった"
+    await interaction.response.send_message(ensure_aa(msg), ephemeral=True)
+
+@client.tree.command(name="subscriptions", description="このチャンネルの定時投稿の一覧")
+async def list_subscriptions(interaction: discord.Interaction):
+    subs = sorted(subscriptions.for_channel(interaction.channel_id), key=lambda s: s["time"])
+    if not subs:
+        await interaction.response.send_message("このチャンネルの定時投稿はまだないよ", ephemeral=True)
+        return
+    lines = [f"{s['time']}  {s['location']}（{s.get('hours', DEFAULT_HOURS)}時間）" for s in subs]
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+def check_comment_packs() -> bool:
+    # python main.py --check-comments：index.json に載っている全方言のパックを検証する
+    ok = True
+    for d in engine.dialects:
+        path = engine._path(d)
+        try:
+            with open(path, encoding="utf-8") as f:
+                problems = validate_pack(json.load(f), d)
+        except (OSError, ValueError) as e:
+            problems = [str(e)]
+        ok = ok and not problems
+        print(f"{d}: OK" if not problems else f"{d}: NG\n  " + "\n  ".join(problems))
+    return ok
+
 def main():
+    if "--check-comments" in sys.argv[1:]:
+        raise SystemExit(0 if check_comment_packs() else 1)
     if not BOT_TOKEN:
         raise RuntimeError("環境変数 DISCORD_BOT_TOKEN が設定されていません。")
     client.run(BOT_TOKEN)